@@ -0,0 +1,107 @@
+"""
+Accuracy check: ONNX / int8 backends against the torch backend
+
+Embeds a fixed multilingual sample set with the torch backend (reference)
+and with each candidate backend, using the same loader as the service
+(app.load_embedding_model), and reports per-sample cosine similarity
+between the reference and candidate vectors, plus load time and encode
+time per backend.
+
+It also checks that the candidate keeps cross-lingual retrieval intact:
+every translation pair must still be each other's nearest neighbour.
+
+Exits with status 1 if any sample falls below --min-cosine, so it can
+gate a switch of LABSE_BACKEND.
+
+Usage:
+    python accuracy_check.py --backends onnx onnx-int8 --min-cosine 0.99
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import app
+
+# Translation pairs: (language, text, pair id). Texts sharing a pair id are
+# translations of each other.
+SAMPLES = [
+    ("en", "The weather is lovely today.", 0),
+    ("ru", "Сегодня прекрасная погода.", 0),
+    ("de", "Das Wetter ist heute herrlich.", 0),
+    ("en", "Where is the nearest train station?", 1),
+    ("es", "¿Dónde está la estación de tren más cercana?", 1),
+    ("fr", "Où est la gare la plus proche ?", 1),
+    ("en", "The committee postponed its decision until next month.", 2),
+    ("ru", "Комитет отложил своё решение до следующего месяца.", 2),
+    ("zh", "委员会将决定推迟到下个月。", 2),
+    ("en", "Neural networks learn representations from data.", 3),
+    ("ja", "ニューラルネットワークはデータから表現を学習する。", 3),
+    ("uk", "Нейронні мережі навчаються представленням з даних.", 3),
+    ("en", "Please close the window before you leave.", 4),
+    ("ar", "من فضلك أغلق النافذة قبل أن تغادر.", 4),
+    ("tr", "Lütfen çıkmadan önce pencereyi kapat.", 4),
+    ("en", "Prices rose sharply after the announcement.", 5),
+    ("hi", "घोषणा के बाद कीमतों में तेज़ी से वृद्धि हुई।", 5),
+    ("pt", "Os preços subiram acentuadamente após o anúncio.", 5),
+]
+
+
+def embed(backend, texts):
+    """Load a backend and embed texts; returns (normalized embeddings, load seconds, encode seconds)"""
+    started = time.perf_counter()
+    model = app.load_embedding_model(backend)
+    load_seconds = time.perf_counter() - started
+    # Warm-up so one-off graph initialization is not counted as encode time
+    model.encode(texts[:2], normalize_embeddings=True)
+    started = time.perf_counter()
+    embeddings = model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+    encode_seconds = time.perf_counter() - started
+    return np.asarray(embeddings, dtype=np.float32), load_seconds, encode_seconds
+
+
+def pairs_preserved(embeddings, pair_ids):
+    """Fraction of samples whose nearest other sample is a translation of it"""
+    similarity = embeddings @ embeddings.T
+    np.fill_diagonal(similarity, -np.inf)
+    nearest = similarity.argmax(axis=1)
+    return float(np.mean(pair_ids[nearest] == pair_ids))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["onnx", "onnx-int8"],
+                        choices=[b for b in app.BACKENDS if b != "torch"], help="Backends to compare with torch")
+    parser.add_argument("--min-cosine", type=float, default=0.99,
+                        help="Lowest acceptable per-sample cosine similarity (default: 0.99)")
+    args = parser.parse_args()
+
+    texts = [text for _, text, _ in SAMPLES]
+    pair_ids = np.array([pair for _, _, pair in SAMPLES])
+
+    reference, load_seconds, encode_seconds = embed("torch", texts)
+    print(f"torch      load {load_seconds:.1f}s  encode {encode_seconds * 1000:.0f} ms  "
+          f"pairs {pairs_preserved(reference, pair_ids):.0%}")
+
+    failed = False
+    for backend in args.backends:
+        embeddings, load_seconds, encode_seconds = embed(backend, texts)
+        cosines = np.sum(reference * embeddings, axis=1)
+        worst = int(cosines.argmin())
+        print(f"{backend:10} load {load_seconds:.1f}s  encode {encode_seconds * 1000:.0f} ms  "
+              f"pairs {pairs_preserved(embeddings, pair_ids):.0%}  "
+              f"cosine mean {cosines.mean():.5f}  min {cosines.min():.5f} ({SAMPLES[worst][0]}: {texts[worst]!r})")
+        for (language, text, _), cosine in zip(SAMPLES, cosines):
+            marker = "  <-- below threshold" if cosine < args.min_cosine else ""
+            print(f"    {language}  {cosine:.5f}  {text}{marker}")
+        failed |= bool(cosines.min() < args.min_cosine)
+
+    if failed:
+        print(f"FAIL: some samples are below cosine {args.min_cosine}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
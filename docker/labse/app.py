@@ -1,34 +1,1198 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 from sentence_transformers import SentenceTransformer
-from typing import List, Union, Optional
+from typing import Callable, Dict, List, Literal, Tuple, Union, Optional
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+import torch
+import asyncio
+import base64
+import bisect
+import copy
+import hashlib
+import http.client
+import json
 import logging
 import os
+import queue
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import urllib.parse
 from contextlib import asynccontextmanager
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Dynamic batching: concurrent requests are merged into one encode call of up
+# to MAX_BATCH_SIZE texts, waiting at most MAX_WAIT_MS for more requests
+MAX_BATCH_SIZE = int(os.environ.get("LABSE_MAX_BATCH_SIZE", "64"))
+MAX_WAIT_MS = float(os.environ.get("LABSE_MAX_WAIT_MS", "5"))
+
+# Each merged batch is sorted by token length and split into forward passes of
+# at most TOKEN_BUDGET padded tokens (longest item x items), so short queries
+# are not padded to the length of transcript chunks in the same batch
+TOKEN_BUDGET = int(os.environ.get("LABSE_TOKEN_BUDGET", "8192"))
+# Fixed cost of one forward pass, in padded-token equivalents, used when
+# deciding whether splitting a group saves more padding than it costs
+PASS_OVERHEAD_TOKENS = 128
+
+# Inference runs in a dedicated thread pool so the event loop stays responsive.
+# INFERENCE_WORKERS batches can encode in parallel; at most MAX_QUEUED_REQUESTS
+# requests may wait for a batch before new ones are rejected with 429.
+INFERENCE_WORKERS = int(os.environ.get("LABSE_INFERENCE_WORKERS", "1"))
+MAX_QUEUED_REQUESTS = int(os.environ.get("LABSE_MAX_QUEUED_REQUESTS", "256"))
+
+# Streaming bulk endpoint: texts per internal batch and batches encoding ahead of the output
+BULK_BATCH_SIZE = int(os.environ.get("LABSE_BULK_BATCH_SIZE", "64"))
+BULK_MAX_IN_FLIGHT = int(os.environ.get("LABSE_BULK_MAX_IN_FLIGHT", "2"))
+
+# Embedding cache: in-memory LRU tier plus an optional on-disk tier (SQLite in the
+# labse_cache volume) that survives restarts. 0 items disables a tier.
+CACHE_MAX_ITEMS = int(os.environ.get("LABSE_CACHE_MAX_ITEMS", "50000"))
+DISK_CACHE_PATH = os.environ.get("LABSE_DISK_CACHE_PATH", "/root/.cache/labse-embeddings/cache.sqlite3")
+DISK_CACHE_MAX_ITEMS = int(os.environ.get("LABSE_DISK_CACHE_MAX_ITEMS", "0"))
+
+# Inference backend: "torch" (full precision), "onnx" (exported ONNX graph) or
+# "onnx-int8" (dynamically quantized ONNX graph). ONNX exports are written once
+# to ONNX_DIR (labse_cache volume) and reused on later starts.
+MODEL_NAME = "sentence-transformers/LaBSE"
+BACKEND = os.environ.get("LABSE_BACKEND", "torch")
+BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_DIR = os.environ.get("LABSE_ONNX_DIR", "/root/.cache/labse-onnx")
+# Quantization config for onnx-int8: arm64, avx2, avx512 or avx512_vnni
+ONNX_QUANTIZATION = os.environ.get("LABSE_ONNX_QUANTIZATION", "avx512_vnni")
+
+# Vector collections: one directory per collection under COLLECTIONS_DIR (labse_cache
+# volume). ANN_PROBES is the default number of inverted lists an approximate search
+# scores; exact scans read SEARCH_BLOCK_ROWS rows at a time.
+COLLECTIONS_DIR = os.environ.get("LABSE_COLLECTIONS_DIR", "/root/.cache/labse-collections")
+ANN_PROBES = int(os.environ.get("LABSE_ANN_PROBES", "8"))
+SEARCH_BLOCK_ROWS = 65536
+COLLECTION_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Elasticsearch sink: chunked, embedded transcripts are buffered and written with
+# the _bulk API. Disabled when LABSE_ES_URL is empty.
+ES_URL = os.environ.get("LABSE_ES_URL", "")
+ES_FLUSH_SIZE = int(os.environ.get("LABSE_ES_FLUSH_SIZE", "500"))
+ES_FLUSH_INTERVAL = float(os.environ.get("LABSE_ES_FLUSH_INTERVAL", "1.0"))
+ES_CONNECTIONS = int(os.environ.get("LABSE_ES_CONNECTIONS", "2"))
+ES_MAX_RETRIES = int(os.environ.get("LABSE_ES_MAX_RETRIES", "5"))
+ES_MAX_QUEUED = int(os.environ.get("LABSE_ES_MAX_QUEUED", "20000"))
+ES_INDEX_NAME = re.compile(r"^[a-z0-9][a-z0-9_.-]{0,254}$")
+
 # Global variable to store the model
 model = None
+batcher = None
+token_encoder = None
+collection_store = None
+es_sink = None
+embedding_cache = None
+
+
+def cache_key(text: str, normalize: bool) -> bytes:
+    """Cache key: SHA-256 of the backend and text plus the normalize flag"""
+    # Backends produce slightly different vectors, so the persistent tier must not mix them;
+    # int8 vectors also depend on the quantization config
+    prefix = b"" if BACKEND == "torch" else BACKEND.encode() + b"\x00"
+    if BACKEND == "onnx-int8":
+        prefix += ONNX_QUANTIZATION.encode() + b"\x00"
+    return hashlib.sha256(prefix + text.encode("utf-8")).digest() + (b"\x01" if normalize else b"\x00")
+
+
+class DiskEmbeddingCache:
+    """Persistent embedding store in SQLite; oldest entries are trimmed past max_items"""
+
+    def __init__(self, path: str, max_items: int):
+        self.max_items = max_items
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key BLOB PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_created ON embeddings (created_at)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, vector in rows:
+                    found[bytes(key)] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def put_many(self, items: Dict[bytes, np.ndarray]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items.items()],
+            )
+            self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if self._count > self.max_items:
+                # Trim 10% below the limit so trimming doesn't run on every insert
+                excess = self._count - int(self.max_items * 0.9)
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY created_at LIMIT ?)", (excess,)
+                )
+                self._count -= excess
+            self._conn.commit()
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: in-memory LRU in front of an optional disk store"""
+
+    def __init__(self, max_items: int, disk: Optional[DiskEmbeddingCache] = None):
+        self.max_items = max_items
+        self.disk = disk
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    async def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found = {}
+        missing = []
+        for key in keys:
+            vector = self._memory.get(key)
+            if vector is None:
+                missing.append(key)
+            else:
+                self._memory.move_to_end(key)
+                found[key] = vector
+        self.memory_hits += len(found)
+
+        if missing and self.disk is not None:
+            from_disk = await asyncio.to_thread(self.disk.get_many, missing)
+            self.disk_hits += len(from_disk)
+            self._remember(from_disk)
+            found.update(from_disk)
+
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def put_many(self, items: Dict[bytes, np.ndarray]):
+        self._remember(items)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.put_many, items)
+
+    def _remember(self, items: Dict[bytes, np.ndarray]):
+        if self.max_items <= 0:
+            return
+        for key, vector in items.items():
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def metrics(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_items": len(self._memory),
+            "memory_max_items": self.max_items,
+            "disk_enabled": self.disk is not None,
+            "disk_items": len(self.disk) if self.disk is not None else 0,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    """Scale each embedding to unit length"""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+class BatcherSaturated(Exception):
+    """Raised when the request queue is full"""
+
+
+def plan_token_batches(lengths: List[int], token_budget: int) -> List[List[int]]:
+    """
+    Group item indices into forward passes of at most token_budget padded tokens.
+
+    Items are sorted longest first and cut into contiguous groups, each padded
+    to its first item. The cuts minimize padded tokens plus a fixed per-pass
+    overhead (PASS_OVERHEAD_TOKENS), so similar lengths share a pass without
+    splitting the batch into many tiny ones. An item longer than the budget
+    gets a pass of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    count = len(order)
+    # cost[j]: cheapest plan for the first j sorted items; cut[j]: where its last group starts
+    cost = [0] + [float("inf")] * count
+    cut = [0] * (count + 1)
+    for end in range(1, count + 1):
+        for begin in range(end):
+            padded = lengths[order[begin]] * (end - begin)
+            if padded > token_budget and end - begin > 1:
+                continue
+            candidate = cost[begin] + padded + PASS_OVERHEAD_TOKENS
+            if candidate < cost[end]:
+                cost[end] = candidate
+                cut[end] = begin
+
+    groups = []
+    end = count
+    while end:
+        groups.append(order[cut[end]:end])
+        end = cut[end]
+    return groups[::-1]
+
+
+class TokenBudgetEncoder:
+    """Encodes texts in length-bucketed forward passes and restores the input order"""
+
+    def __init__(self, model: SentenceTransformer, token_budget: int):
+        self.model = model
+        self.token_budget = token_budget
+        # Fast tokenizers are not safe to reconfigure from several threads at once. model.encode
+        # tokenizes through model.tokenize, so route that through the lock token_lengths holds:
+        # with several inference workers only the forward passes run in parallel
+        self._tokenizer_lock = threading.Lock()
+        tokenize = model.tokenize
+
+        def locked_tokenize(texts):
+            with self._tokenizer_lock:
+                return tokenize(texts)
+
+        model.tokenize = locked_tokenize
+        # Document spans run outside the encode executor with truncation off: they get a
+        # tokenizer of their own so they never reconfigure the one model.encode uses
+        self._span_tokenizer = copy.deepcopy(model.tokenizer)
+        self._span_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # Metrics
+        self.forward_passes = 0
+        self.tokens = 0
+        self.padded_tokens = 0
+
+    def token_lengths(self, texts: List[str]) -> List[int]:
+        max_length = self.model.max_seq_length
+        with self._tokenizer_lock:
+            input_ids = self.model.tokenizer(texts, truncation=True, max_length=max_length)["input_ids"]
+        return [len(ids) for ids in input_ids]
+
+    def token_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Character span of every token of text, without special tokens or truncation"""
+        with self._span_lock:
+            encoded = self._span_tokenizer(
+                text, add_special_tokens=False, truncation=False, return_offsets_mapping=True, verbose=False
+            )
+        return [tuple(span) for span in encoded["offset_mapping"]]
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        lengths = self.token_lengths(texts)
+        embeddings = None
+        for group in plan_token_batches(lengths, self.token_budget):
+            encoded = self.model.encode(
+                [texts[i] for i in group], batch_size=len(group), normalize_embeddings=False, convert_to_numpy=True
+            )
+            if embeddings is None:
+                embeddings = np.empty((len(texts), encoded.shape[1]), dtype=encoded.dtype)
+            embeddings[group] = encoded
+            with self._stats_lock:
+                self.forward_passes += 1
+                self.tokens += sum(lengths[i] for i in group)
+                self.padded_tokens += lengths[group[0]] * len(group)
+        return embeddings
+
+    def metrics(self) -> dict:
+        return {
+            "token_budget": self.token_budget,
+            "forward_passes": self.forward_passes,
+            "padding_efficiency": round(self.tokens / self.padded_tokens, 4) if self.padded_tokens else 1.0,
+        }
+
+
+class _PendingRequest:
+    """Texts of one request waiting to be encoded"""
+
+    def __init__(self, texts: List[str], future: asyncio.Future):
+        self.texts = texts
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class EmbeddingBatcher:
+    """Merges concurrent embedding requests into shared encode calls"""
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_batch_size: int, max_wait_ms: float,
+                 workers: int = 1, max_queued: int = 0):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.workers = workers
+        self.max_queued = max_queued
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._carry: Optional[_PendingRequest] = None
+        self._in_flight = set()
+        self.rejected = 0
+        # Metrics
+        self.batches = 0
+        self.texts = 0
+        self.requests = 0
+        self.max_observed_batch = 0
+        self._recent_sizes = deque(maxlen=1000)
+        self._recent_delays = deque(maxlen=1000)
+
+    def start(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="labse-encode")
+        self._slots = asyncio.Semaphore(self.workers)
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    async def submit(self, texts: List[str]) -> np.ndarray:
+        """Queue texts for encoding and wait for their (unnormalized) embeddings"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(_PendingRequest(texts, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise BatcherSaturated()
+        return await future
+
+    async def _next_request(self, timeout: Optional[float]) -> Optional[_PendingRequest]:
+        if self._carry is not None:
+            pending, self._carry = self._carry, None
+            return pending
+        if timeout is None:
+            return await self._queue.get()
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _collect(self) -> List[_PendingRequest]:
+        """Wait for a request, then gather more until the batch is full or the wait expires"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._next_request(None)]
+        size = len(batch[0].texts)
+        deadline = loop.time() + self.max_wait
+        while size < self.max_batch_size:
+            pending = await self._next_request(max(deadline - loop.time(), 0))
+            if pending is None:
+                break
+            if size + len(pending.texts) > self.max_batch_size:
+                # Keep the batch bounded; this request starts the next one
+                self._carry = pending
+                break
+            batch.append(pending)
+            size += len(pending.texts)
+        return batch
+
+    async def _run(self):
+        while True:
+            # Wait for a free worker first: requests arriving meanwhile join the next batch
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            task = asyncio.create_task(self._encode_batch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _encode_batch(self, batch: List[_PendingRequest]):
+        try:
+            texts = [text for pending in batch for text in pending.texts]
+            started = time.perf_counter()
+            self._record(batch, len(texts), started)
+            loop = asyncio.get_running_loop()
+            try:
+                embeddings = await loop.run_in_executor(self._executor, self.encode, texts)
+            except Exception as e:
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+                return
+
+            offset = 0
+            for pending in batch:
+                count = len(pending.texts)
+                if not pending.future.done():
+                    pending.future.set_result(embeddings[offset:offset + count])
+                offset += count
+        finally:
+            self._slots.release()
+
+    def _record(self, batch: List[_PendingRequest], size: int, started: float):
+        self.batches += 1
+        self.requests += len(batch)
+        self.texts += size
+        self.max_observed_batch = max(self.max_observed_batch, size)
+        self._recent_sizes.append(size)
+        for pending in batch:
+            self._recent_delays.append((started - pending.enqueued_at) * 1000)
+
+    def metrics(self) -> dict:
+        sizes = sorted(self._recent_sizes)
+        delays = sorted(self._recent_delays)
+
+        def percentile(values, q):
+            return round(values[min(int(len(values) * q), len(values) - 1)], 3) if values else 0.0
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "workers": self.workers,
+            "busy_workers": len(self._in_flight),
+            "queued_requests": self._queue.qsize() if self._queue is not None else 0,
+            "max_queued_requests": self.max_queued,
+            "rejected_requests": self.rejected,
+            "batches": self.batches,
+            "requests": self.requests,
+            "texts": self.texts,
+            "mean_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "max_observed_batch_size": self.max_observed_batch,
+            "recent_batch_size_p50": percentile(sizes, 0.5),
+            "recent_batch_size_p95": percentile(sizes, 0.95),
+            "recent_queue_delay_ms_p50": percentile(delays, 0.5),
+            "recent_queue_delay_ms_p95": percentile(delays, 0.95),
+            "recent_queue_delay_ms_max": round(delays[-1], 3) if delays else 0.0,
+        }
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first"""
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class VectorCollection:
+    """
+    Named persistent vector collection.
+
+    Unit-length float32 vectors live in a memory-mapped file (vectors.f32), ids,
+    texts and metadata in SQLite. Rows are kept contiguous: a delete moves the
+    last row into the freed slot, so exact search is one scan over the first
+    `count` rows. The optional approximate index is an inverted file: k-means
+    centroids plus the nearest centroid of every row (lists.i32, parallel to the
+    vectors); a search only scores rows in the lists closest to the query.
+    """
+
+    def __init__(self, path: str, dimensions: int):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(path, "items.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "id TEXT PRIMARY KEY, row INTEGER NOT NULL UNIQUE, text TEXT, metadata TEXT)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('dimensions', ?)", (str(dimensions),))
+        self._conn.commit()
+        self.dimensions = int(self._conn.execute("SELECT value FROM settings WHERE key = 'dimensions'").fetchone()[0])
+        self.count = self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        self._capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._lists: Optional[np.memmap] = None
+        self._grow(max(self.count, 1024))
+        centroids_path = os.path.join(path, "centroids.npy")
+        self.centroids = np.load(centroids_path) if os.path.exists(centroids_path) else None
+
+    def _grow(self, capacity: int):
+        """Resize the memory-mapped files to hold at least capacity rows"""
+        if capacity <= self._capacity:
+            return
+        self._capacity = max(capacity, self._capacity * 2)
+        self._vectors = self._open_array("vectors.f32", np.float32, (self._capacity, self.dimensions))
+        self._lists = self._open_array("lists.i32", np.int32, (self._capacity,))
+
+    def _open_array(self, name: str, dtype, shape) -> np.memmap:
+        path = os.path.join(self.path, name)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _rows(self, ids: List[str]) -> Dict[str, int]:
+        rows = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows.update(self._conn.execute(f"SELECT id, row FROM items WHERE id IN ({placeholders})", chunk))
+        return rows
+
+    def _nearest_lists(self, vectors: np.ndarray) -> np.ndarray:
+        if self.centroids is None:
+            return np.full(len(vectors), -1, dtype=np.int32)
+        return (vectors @ self.centroids.T).argmax(axis=1).astype(np.int32)
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, texts: List[Optional[str]],
+               metadata: List[Optional[dict]], add_only: bool = False) -> Tuple[int, int]:
+        """
+        Insert or replace items; returns (added, updated).
+
+        With add_only, nothing is written if any id already exists (KeyError).
+        A repeated id within one call keeps its last occurrence.
+        """
+        latest = {item_id: i for i, item_id in enumerate(ids)}
+        with self._lock:
+            existing = self._rows(list(latest))
+            if add_only and existing:
+                raise KeyError(sorted(existing))
+            self._grow(self.count + len(latest) - len(existing))
+
+            positions = list(latest.values())
+            rows = []
+            for item_id in latest:
+                if item_id in existing:
+                    rows.append(existing[item_id])
+                else:
+                    rows.append(self.count)
+                    self.count += 1
+            self._vectors[rows] = vectors[positions]
+            self._lists[rows] = self._nearest_lists(vectors[positions])
+            self._vectors.flush()
+            self._lists.flush()
+            self._conn.executemany(
+                "INSERT INTO items (id, row, text, metadata) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET text = excluded.text, metadata = excluded.metadata",
+                [
+                    (item_id, row, texts[i], json.dumps(metadata[i]) if metadata[i] is not None else None)
+                    for (item_id, i), row in zip(latest.items(), rows)
+                ],
+            )
+            self._conn.commit()
+        return len(latest) - len(existing), len(existing)
+
+    def delete(self, ids: List[str]) -> int:
+        """Delete items by id; returns how many existed"""
+        with self._lock:
+            deleted = 0
+            rows = self._rows(list(dict.fromkeys(ids)))
+            # Highest row first: the last row that fills each gap is never one still to be deleted
+            for item_id, row in sorted(rows.items(), key=lambda item: item[1], reverse=True):
+                last = self.count - 1
+                self._conn.execute("DELETE FROM items WHERE id = ?", (item_id,))
+                if row != last:
+                    # Keep rows contiguous: the last row fills the gap
+                    self._vectors[row] = self._vectors[last]
+                    self._lists[row] = self._lists[last]
+                    self._conn.execute("UPDATE items SET row = ? WHERE row = ?", (row, last))
+                self.count -= 1
+                deleted += 1
+            self._vectors.flush()
+            self._lists.flush()
+            self._conn.commit()
+        return deleted
+
+    def search(self, queries: np.ndarray, k: int, probes: Optional[int] = None) -> List[List[dict]]:
+        """
+        Top-k cosine search for unit-length query vectors.
+
+        Without probes the scan is exact, in blocks of SEARCH_BLOCK_ROWS rows so
+        memory stays bounded on large collections; with probes only rows in the
+        probes lists nearest to each query are scored.
+        """
+        with self._lock:
+            count = self.count
+            if count == 0:
+                return [[] for _ in queries]
+            vectors = self._vectors[:count]
+            if probes is not None and self.centroids is not None:
+                lists = self._lists[:count]
+                matches = []
+                for query in queries:
+                    nearest = top_k(self.centroids @ query, min(probes, len(self.centroids)))
+                    rows = np.flatnonzero(np.isin(lists, nearest))
+                    scores = vectors[rows] @ query
+                    best = top_k(scores, k)
+                    matches.append((rows[best], scores[best]))
+            else:
+                best_rows = [np.empty(0, dtype=np.int64) for _ in queries]
+                best_scores = [np.empty(0, dtype=np.float32) for _ in queries]
+                for start in range(0, count, SEARCH_BLOCK_ROWS):
+                    block = vectors[start:start + SEARCH_BLOCK_ROWS] @ queries.T
+                    for q in range(len(queries)):
+                        rows = np.concatenate([best_rows[q], np.arange(start, start + len(block))])
+                        scores = np.concatenate([best_scores[q], block[:, q]])
+                        best = top_k(scores, k)
+                        best_rows[q], best_scores[q] = rows[best], scores[best]
+                matches = list(zip(best_rows, best_scores))
+
+            wanted = sorted({int(row) for rows, _ in matches for row in rows})
+            items = {}
+            for start in range(0, len(wanted), 500):
+                chunk = wanted[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for item_id, row, text, metadata in self._conn.execute(
+                    f"SELECT id, row, text, metadata FROM items WHERE row IN ({placeholders})", chunk
+                ):
+                    items[row] = (item_id, text, json.loads(metadata) if metadata is not None else None)
+
+        return [
+            [
+                {"id": items[int(row)][0], "score": float(score), "text": items[int(row)][1],
+                 "metadata": items[int(row)][2]}
+                for row, score in zip(rows, scores)
+            ]
+            for rows, scores in matches
+        ]
+
+    def build_index(self, lists: Optional[int] = None, iterations: int = 10) -> int:
+        """
+        Build the approximate index with spherical k-means; returns the number of lists.
+
+        Centroids are trained on a sample of up to 256 rows per list, then every
+        row is assigned to its nearest centroid. Rows added later are assigned
+        on insert; rebuild after large changes to rebalance the lists.
+        """
+        with self._lock:
+            count = self.count
+            if count == 0:
+                raise ValueError("collection is empty")
+            lists = min(lists or max(int(np.sqrt(count)), 1), count)
+            rng = np.random.default_rng(0)
+            sample = np.asarray(self._vectors[rng.choice(count, min(count, lists * 256), replace=False)])
+            centroids = sample[rng.choice(len(sample), lists, replace=False)]
+            for _ in range(iterations):
+                assignment = (sample @ centroids.T).argmax(axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, sample)
+                filled = np.bincount(assignment, minlength=lists) > 0
+                # Empty lists keep their previous centroid
+                centroids[filled] = normalize_rows(sums[filled])
+
+            self.centroids = centroids.astype(np.float32)
+            for start in range(0, count, SEARCH_BLOCK_ROWS):
+                block = self._vectors[start:start + SEARCH_BLOCK_ROWS][:count - start]
+                self._lists[start:start + len(block)] = self._nearest_lists(block)
+            self._lists.flush()
+            np.save(os.path.join(self.path, "centroids.npy"), self.centroids)
+        return lists
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                "count": self.count,
+                "dimensions": self.dimensions,
+                "indexed": self.centroids is not None,
+                "lists": len(self.centroids) if self.centroids is not None else 0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+            self._vectors = None
+            self._lists = None
+
+
+class CollectionStore:
+    """Opens collections lazily from one directory per collection under root"""
+
+    def __init__(self, root: str, dimensions: int):
+        self.root = root
+        self.dimensions = dimensions
+        os.makedirs(root, exist_ok=True)
+        self._collections: Dict[str, VectorCollection] = {}
+        self._lock = threading.Lock()
+
+    def names(self) -> List[str]:
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isfile(os.path.join(self.root, name, "items.sqlite3"))
+        )
+
+    def get(self, name: str, create: bool = False) -> Optional[VectorCollection]:
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                path = os.path.join(self.root, name)
+                if not create and not os.path.isfile(os.path.join(path, "items.sqlite3")):
+                    return None
+                collection = VectorCollection(path, self.dimensions)
+                self._collections[name] = collection
+            return collection
+
+    def drop(self, name: str) -> bool:
+        with self._lock:
+            collection = self._collections.pop(name, None)
+            if collection is not None:
+                collection.close()
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path):
+                return False
+            shutil.rmtree(path)
+            return True
+
+    def close(self):
+        with self._lock:
+            for collection in self._collections.values():
+                collection.close()
+            self._collections.clear()
+
+
+class SinkSaturated(Exception):
+    """Raised when the Elasticsearch sink buffer cannot take more documents"""
+
+
+class ElasticsearchSink:
+    """
+    Buffers documents and writes them to Elasticsearch through the _bulk API.
+
+    A bulk request is sent once flush_size actions are buffered, or flush_interval
+    seconds after the first one arrived. Up to `connections` bulk requests run in
+    parallel over persistent keep-alive connections. Throttling (HTTP 429 for the
+    whole request or for single items), 5xx responses and connection errors are
+    retried with exponential backoff; other item errors are counted as failed.
+    """
+
+    def __init__(self, url: str, flush_size: int, flush_interval: float, connections: int = 2,
+                 max_retries: int = 5, max_queued: int = 10000, dimensions: int = 768, timeout: float = 30):
+        parts = urllib.parse.urlsplit(url)
+        self.url = url
+        self._connection_class = (
+            http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        )
+        self._netloc = parts.netloc
+        self._base_path = parts.path.rstrip("/")
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.connections = connections
+        self.max_retries = max_retries
+        self.max_queued = max_queued
+        self.dimensions = dimensions
+        self.timeout = timeout
+        self.backoff_base = 0.5
+        self.backoff_max = 30.0
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._in_flight = set()
+        self._ready_indices = set()
+        # Metrics
+        self.indexed = 0
+        self.failed = 0
+        self.bulk_requests = 0
+        self.retries = 0
+        self.throttled_requests = 0
+        self.throttled_items = 0
+        self.bytes_sent = 0
+        self._bulk_seconds = 0.0
+        self._recent = deque()
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.connections)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 30):
+        """Flush what is buffered (bounded by timeout), then close connections"""
+        if self._task is not None:
+            # _run batches and flushes everything queued ahead of the sentinel, then returns
+            self._queue.put_nowait(None)
+            try:
+                await asyncio.wait_for(self._task, timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Elasticsearch sink stopped with {self._queue.qsize()} document(s) unsent")
+        if self._in_flight:
+            await asyncio.wait(self._in_flight, timeout=timeout)
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+    def submit(self, actions: List[Tuple[str, str, dict]]):
+        """Buffer (index, id, document) actions; all or nothing when the buffer is full"""
+        if self._queue.qsize() + len(actions) > self.max_queued:
+            raise SinkSaturated()
+        for action in actions:
+            self._queue.put_nowait(action)
+
+    def _track(self, task: asyncio.Task):
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _collect(self) -> Optional[List[Tuple[str, str, dict]]]:
+        """Next batch, or None once the stop sentinel is reached"""
+        loop = asyncio.get_running_loop()
+        first = await self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.flush_size:
+            try:
+                action = await asyncio.wait_for(self._queue.get(), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                break
+            if action is None:
+                # Stopping: send this batch now, end on the next call
+                self._queue.put_nowait(None)
+                break
+            batch.append(action)
+        return batch
+
+    async def _run(self):
+        while True:
+            # Collect the next batch only when a connection is free, so batches fill up under load
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            if batch is None:
+                self._slots.release()
+                return
+            self._track(asyncio.create_task(self._flush(batch)))
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None,
+                 content_type: str = "application/json") -> Tuple[int, bytes, Optional[str]]:
+        """Blocking HTTP request on a pooled keep-alive connection; returns (status, body, Retry-After)"""
+        for attempt in range(2):
+            try:
+                connection, reused = self._idle.get_nowait(), True
+            except queue.Empty:
+                connection, reused = self._connection_class(self._netloc, timeout=self.timeout), False
+            try:
+                connection.request(method, self._base_path + path, body=body, headers={"Content-Type": content_type})
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                # The server may have closed an idle keep-alive connection: retry once on a new one
+                if reused and attempt == 0:
+                    continue
+                raise
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._idle.put(connection)
+            return response.status, data, response.getheader("Retry-After")
+
+    async def _ensure_indices(self, indices: set):
+        """Create missing indices with a dense_vector mapping for the embeddings"""
+        for index in indices - self._ready_indices:
+            mapping = {"mappings": {"properties": {
+                "embedding": {"type": "dense_vector", "dims": self.dimensions, "index": True, "similarity": "cosine"},
+                "text": {"type": "text"},
+                "document_id": {"type": "keyword"},
+                "chunk": {"type": "integer"},
+                "start_char": {"type": "integer"},
+                "end_char": {"type": "integer"},
+                "start_time": {"type": "float"},
+                "end_time": {"type": "float"},
+            }}}
+            try:
+                status, data, _ = await asyncio.to_thread(
+                    self._request, "PUT", f"/{urllib.parse.quote(index)}", json.dumps(mapping).encode()
+                )
+            except (OSError, http.client.HTTPException) as e:
+                logger.warning(f"Could not create index {index}: {e}")
+                continue
+            if status < 300 or b"resource_already_exists_exception" in data:
+                self._ready_indices.add(index)
+            else:
+                logger.warning(f"Could not create index {index}: HTTP {status} {data[:200]!r}")
+
+    async def _flush(self, batch: List[Tuple[str, str, dict]]):
+        pending = batch
+        try:
+            await self._ensure_indices({index for index, _, _ in batch})
+            attempt = 0
+            while pending:
+                body = "".join(
+                    json.dumps({"index": {"_index": index, "_id": doc_id}}) + "\n" + json.dumps(document) + "\n"
+                    for index, doc_id, document in pending
+                ).encode("utf-8")
+                started = time.perf_counter()
+                retry_after = None
+                try:
+                    status, data, retry_after = await asyncio.to_thread(
+                        self._request, "POST", "/_bulk", body, "application/x-ndjson"
+                    )
+                except (OSError, http.client.HTTPException) as e:
+                    logger.warning(f"Bulk request to {self.url} failed: {e}")
+                    status, data = None, b""
+                self.bulk_requests += 1
+                self.bytes_sent += len(body)
+                self._bulk_seconds += time.perf_counter() - started
+
+                if status == 200:
+                    retry = []
+                    indexed = 0
+                    for action, item in zip(pending, json.loads(data)["items"]):
+                        result = next(iter(item.values()))
+                        if result.get("status") == 429:
+                            retry.append(action)
+                        elif result.get("status", 500) >= 300:
+                            self.failed += 1
+                            logger.warning(f"Document {action[1]} rejected: {result.get('error')}")
+                        else:
+                            indexed += 1
+                    self.indexed += indexed
+                    self._recent.append((time.monotonic(), indexed))
+                    self.throttled_items += len(retry)
+                    pending = retry
+                elif status == 429 or status is None or status >= 500:
+                    self.throttled_requests += status == 429
+                else:
+                    self.failed += len(pending)
+                    logger.error(f"Bulk request rejected: HTTP {status} {data[:200]!r}")
+                    return
+
+                if pending:
+                    attempt += 1
+                    if attempt > self.max_retries:
+                        self.failed += len(pending)
+                        logger.error(f"Dropping {len(pending)} document(s) after {self.max_retries} retries")
+                        return
+                    self.retries += 1
+                    delay = min(self.backoff_base * 2 ** (attempt - 1), self.backoff_max)
+                    if retry_after and retry_after.isdigit():
+                        delay = max(delay, float(retry_after))
+                    await asyncio.sleep(delay)
+        except Exception as e:
+            # Documents indexed on an earlier attempt are already counted
+            self.failed += len(pending)
+            logger.error(f"Bulk flush failed: {e}")
+        finally:
+            self._slots.release()
+
+    def metrics(self) -> dict:
+        now = time.monotonic()
+        while self._recent and now - self._recent[0][0] > 60:
+            self._recent.popleft()
+        return {
+            "url": self.url,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queued": self.max_queued,
+            "in_flight_requests": len(self._in_flight),
+            "indexed": self.indexed,
+            "failed": self.failed,
+            "bulk_requests": self.bulk_requests,
+            "retries": self.retries,
+            "throttled_requests": self.throttled_requests,
+            "throttled_items": self.throttled_items,
+            "bytes_sent": self.bytes_sent,
+            "mean_bulk_ms": round(self._bulk_seconds / self.bulk_requests * 1000, 2) if self.bulk_requests else 0.0,
+            "docs_per_second_1m": round(sum(count for _, count in self._recent) / 60, 2),
+        }
+
+
+def pack_embeddings(embeddings: np.ndarray, dtype: str) -> Tuple[bytes, Optional[bytes]]:
+    """
+    Serialize embeddings as little-endian row-major bytes.
+
+    int8 is quantized symmetrically per vector; the float32 scales are returned
+    separately so that vector = int8 values * scale.
+    """
+    if dtype == "int8":
+        scales = np.abs(embeddings).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        quantized = np.round(embeddings / scales[:, None]).astype("<i1")
+        return quantized.tobytes(), scales.astype("<f4").tobytes()
+    little_endian = "<f2" if dtype == "float16" else "<f4"
+    return embeddings.astype(little_endian).tobytes(), None
+
+
+def embeddings_response(embeddings: np.ndarray, encoding: str, dtype: str, cached: int) -> Response:
+    """Render embeddings in the negotiated encoding without pydantic validation of the vectors"""
+    count, dimensions = embeddings.shape
+    if encoding == "json":
+        return JSONResponse({
+            "embeddings": embeddings.tolist(),
+            "dimensions": dimensions,
+            "count": count,
+            "cached": cached,
+        })
+
+    data, scales = pack_embeddings(embeddings, dtype)
+    if encoding == "binary":
+        headers = {
+            "X-Embedding-Shape": f"{count},{dimensions}",
+            "X-Embedding-Dtype": dtype,
+            "X-Embedding-Byteorder": "little",
+            "X-Embedding-Cached": str(cached),
+        }
+        if scales is not None:
+            # Scales follow the int8 matrix in the body
+            headers["X-Embedding-Scales-Offset"] = str(len(data))
+            data += scales
+        return Response(content=data, media_type="application/octet-stream", headers=headers)
+
+    return JSONResponse({
+        "encoding": "base64",
+        "dtype": dtype,
+        "shape": [count, dimensions],
+        "data": base64.b64encode(data).decode("ascii"),
+        "scales": base64.b64encode(scales).decode("ascii") if scales is not None else None,
+        "dimensions": dimensions,
+        "count": count,
+        "cached": cached,
+    })
+
+
+async def embed_texts(texts: List[str], normalize: bool) -> Tuple[np.ndarray, int]:
+    """
+    Embed texts through the cache and the batcher.
+
+    Only texts missing from the cache (deduplicated) are sent to the model.
+    Returns the embeddings in input order and how many were served from cache.
+    """
+    keys = [cache_key(text, normalize) for text in texts]
+    found = await embedding_cache.get_many(list(dict.fromkeys(keys)))
+    served_from_cache = sum(1 for key in keys if key in found)
+
+    misses = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in misses:
+            misses[key] = text
+
+    if misses:
+        computed = await batcher.submit(list(misses.values()))
+        if normalize:
+            computed = normalize_rows(computed)
+        # Own copy per row: a cached view would keep its whole batch matrix alive
+        computed = computed.astype(np.float32, copy=False)
+        new_items = {key: row.copy() for key, row in zip(misses.keys(), computed)}
+        await embedding_cache.put_many(new_items)
+        found.update(new_items)
+
+    return np.stack([found[key] for key in keys]), served_from_cache
+
+
+def load_embedding_model(backend: str = BACKEND) -> SentenceTransformer:
+    """
+    Load LaBSE with the given inference backend.
+
+    ONNX backends export the transformer to ONNX_DIR on first use (and quantize
+    it for onnx-int8); later loads read the exported graph directly. Pooling,
+    the dense projection and normalization stay in sentence-transformers, so
+    every backend has the same encode() interface and output dimensions.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    if backend == "torch":
+        return SentenceTransformer(MODEL_NAME)
+
+    file_name = "onnx/model.onnx"
+    if backend == "onnx-int8":
+        file_name = f"onnx/model_qint8_{ONNX_QUANTIZATION}.onnx"
+    if os.path.exists(os.path.join(ONNX_DIR, file_name)):
+        return SentenceTransformer(ONNX_DIR, backend="onnx", model_kwargs={"file_name": file_name})
+
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    if os.path.exists(os.path.join(ONNX_DIR, "onnx/model.onnx")):
+        # Already exported (by the onnx backend or another quantization config): quantize that graph
+        exported = SentenceTransformer(ONNX_DIR, backend="onnx")
+    else:
+        logger.info(f"Exporting {MODEL_NAME} to ONNX in {ONNX_DIR}...")
+        exported = SentenceTransformer(MODEL_NAME, backend="onnx")
+        exported.save_pretrained(ONNX_DIR)
+        if backend == "onnx":
+            return exported
+    logger.info(f"Quantizing ONNX graph to int8 ({ONNX_QUANTIZATION})...")
+    export_dynamic_quantized_onnx_model(exported, ONNX_QUANTIZATION, ONNX_DIR)
+    return SentenceTransformer(ONNX_DIR, backend="onnx", model_kwargs={"file_name": file_name})
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Load model on startup and clean up on shutdown"""
-    global model
+    global model, batcher, token_encoder, embedding_cache, collection_store, es_sink
     try:
-        logger.info("Loading LaBSE model...")
-        model = SentenceTransformer('sentence-transformers/LaBSE')
-        logger.info("LaBSE model loaded successfully!")
+        logger.info(f"Loading LaBSE model ({BACKEND} backend)...")
+        started = time.perf_counter()
+        model = load_embedding_model(BACKEND)
+        logger.info(f"LaBSE model loaded successfully in {time.perf_counter() - started:.1f}s!")
     except Exception as e:
         logger.error(f"Failed to load model: {e}")
         raise
+    if INFERENCE_WORKERS > 1:
+        # Split intra-op threads between workers instead of oversubscribing cores
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // INFERENCE_WORKERS))
+    token_encoder = TokenBudgetEncoder(model, TOKEN_BUDGET)
+    batcher = EmbeddingBatcher(
+        token_encoder,
+        MAX_BATCH_SIZE,
+        MAX_WAIT_MS,
+        workers=INFERENCE_WORKERS,
+        max_queued=MAX_QUEUED_REQUESTS,
+    )
+    batcher.start()
+    disk_cache = None
+    if DISK_CACHE_MAX_ITEMS > 0:
+        disk_cache = DiskEmbeddingCache(DISK_CACHE_PATH, DISK_CACHE_MAX_ITEMS)
+        logger.info(f"Disk embedding cache: {len(disk_cache)} entries in {DISK_CACHE_PATH}")
+    embedding_cache = EmbeddingCache(CACHE_MAX_ITEMS, disk_cache)
+    collection_store = CollectionStore(COLLECTIONS_DIR, model.get_sentence_embedding_dimension())
+    if ES_URL:
+        es_sink = ElasticsearchSink(
+            ES_URL,
+            ES_FLUSH_SIZE,
+            ES_FLUSH_INTERVAL,
+            connections=ES_CONNECTIONS,
+            max_retries=ES_MAX_RETRIES,
+            max_queued=ES_MAX_QUEUED,
+            dimensions=model.get_sentence_embedding_dimension(),
+        )
+        es_sink.start()
+        logger.info(f"Elasticsearch sink writing to {ES_URL}")
     yield
     # Cleanup
     logger.info("Shutting down...")
+    if es_sink is not None:
+        await es_sink.stop()
+    await batcher.stop()
+    if disk_cache is not None:
+        disk_cache.close()
+    collection_store.close()
 
 # Create FastAPI app
 app = FastAPI(
@@ -58,11 +1222,40 @@ class EmbeddingRequest(BaseModel):
         default=True,
         description="Whether to normalize embeddings to unit length"
     )
+    encoding: Optional[Literal["json", "base64", "binary"]] = Field(
+        default=None,
+        description="Response encoding: json lists (default), a base64 blob inside JSON, or a raw "
+                    "little-endian binary body (also selected by Accept: application/octet-stream)"
+    )
+    dtype: Literal["float32", "float16", "int8"] = Field(
+        default="float32",
+        description="Element type for base64/binary encodings; int8 is quantized per vector with float32 scales"
+    )
 
 class EmbeddingResponse(BaseModel):
-    embeddings: List[List[float]] = Field(
-        ...,
-        description="List of embedding vectors"
+    embeddings: Optional[List[List[float]]] = Field(
+        default=None,
+        description="List of embedding vectors (json encoding)"
+    )
+    encoding: str = Field(
+        default="json",
+        description="Encoding of the vectors: json or base64"
+    )
+    dtype: Optional[str] = Field(
+        default=None,
+        description="Element type of the base64 data"
+    )
+    shape: Optional[List[int]] = Field(
+        default=None,
+        description="Shape of the base64 data as [count, dimensions]"
+    )
+    data: Optional[str] = Field(
+        default=None,
+        description="Base64 of the little-endian row-major embedding matrix"
+    )
+    scales: Optional[str] = Field(
+        default=None,
+        description="Base64 of little-endian float32 per-vector scales (int8 only): vector = data * scale"
     )
     dimensions: int = Field(
         ...,
@@ -72,11 +1265,176 @@ class EmbeddingResponse(BaseModel):
         ...,
         description="Number of embeddings generated"
     )
+    cached: int = Field(
+        default=0,
+        description="Number of embeddings served from cache"
+    )
 
 class HealthResponse(BaseModel):
     status: str
     model: str
+    backend: str
+    dimensions: int
+
+class BatchingMetrics(BaseModel):
+    max_batch_size: int
+    max_wait_ms: float
+    workers: int
+    busy_workers: int
+    queued_requests: int
+    max_queued_requests: int
+    rejected_requests: int
+    batches: int
+    requests: int
+    texts: int
+    mean_batch_size: float
+    max_observed_batch_size: int
+    recent_batch_size_p50: float
+    recent_batch_size_p95: float
+    recent_queue_delay_ms_p50: float
+    recent_queue_delay_ms_p95: float
+    recent_queue_delay_ms_max: float
+    token_budget: int
+    forward_passes: int
+    padding_efficiency: float
+
+class CacheMetrics(BaseModel):
+    memory_items: int
+    memory_max_items: int
+    disk_enabled: bool
+    disk_items: int
+    memory_hits: int
+    disk_hits: int
+    misses: int
+    hit_rate: float
+
+class ElasticsearchMetrics(BaseModel):
+    url: str
+    queued: int
+    max_queued: int
+    in_flight_requests: int
+    indexed: int
+    failed: int
+    bulk_requests: int
+    retries: int
+    throttled_requests: int
+    throttled_items: int
+    bytes_sent: int
+    mean_bulk_ms: float
+    docs_per_second_1m: float
+
+class MetricsResponse(BaseModel):
+    batching: BatchingMetrics
+    cache: CacheMetrics
+    elasticsearch: Optional[ElasticsearchMetrics] = None
+
+class TranscriptSegment(BaseModel):
+    start: float
+    end: float
+    text: str
+
+class ChunkingOptions(BaseModel):
+    chunk_by: Literal["sentences", "tokens"] = Field(
+        default="sentences",
+        description="Pack whole sentences (or segments), or slide a fixed token window"
+    )
+    max_tokens: Optional[int] = Field(
+        default=None, ge=8,
+        description="Tokens per chunk (default and maximum: the model's sequence length minus special tokens)"
+    )
+    overlap_tokens: int = Field(default=32, ge=0, description="Tokens shared by consecutive chunks")
+    normalize: bool = Field(default=True, description="Whether to normalize embeddings to unit length")
+
+class DocumentRequest(ChunkingOptions):
+    text: Optional[str] = Field(default=None, max_length=2_000_000, description="Long document text")
+    segments: Optional[List[TranscriptSegment]] = Field(
+        default=None,
+        description="Whisper segments ({start, end, text}); chunks then carry time offsets"
+    )
+    pool: bool = Field(default=False, description="Also return a token-weighted mean document vector")
+
+class DocumentChunk(BaseModel):
+    index: int
+    text: str
+    start_char: int
+    end_char: int
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+    tokens: int
+    embedding: List[float]
+
+class DocumentResponse(BaseModel):
+    chunks: List[DocumentChunk]
+    document_embedding: Optional[List[float]] = None
     dimensions: int
+    count: int
+    cached: int
+
+class TranscriptDocument(BaseModel):
+    id: str = Field(..., min_length=1, description="Document id; chunks are indexed as <id>#<chunk>")
+    text: Optional[str] = Field(default=None, max_length=2_000_000)
+    segments: Optional[List[TranscriptSegment]] = None
+    metadata: Optional[dict] = Field(default=None, description="Stored with every chunk under metadata")
+
+class ElasticsearchIndexRequest(ChunkingOptions):
+    documents: List[TranscriptDocument] = Field(..., min_length=1, max_length=1000)
+
+class ElasticsearchIndexResponse(BaseModel):
+    documents: int
+    queued: int
+
+class CollectionItem(BaseModel):
+    id: str = Field(..., min_length=1, description="Item id, unique within the collection")
+    text: str = Field(..., description="Text to embed and store")
+    metadata: Optional[dict] = Field(default=None, description="Arbitrary JSON returned with search hits")
+
+class CollectionItemsRequest(BaseModel):
+    items: List[CollectionItem] = Field(..., min_length=1, max_length=1000)
+
+class DeleteItemsRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1)
+
+class SearchRequest(BaseModel):
+    query: Union[str, List[str]] = Field(
+        ...,
+        description="Query text, or a list of queries searched together",
+        example="как настроить распознавание речи"
+    )
+    k: int = Field(default=10, ge=1, le=1000, description="Number of hits per query")
+    approximate: Optional[bool] = Field(
+        default=None,
+        description="Use the approximate index; by default it is used when the collection has one"
+    )
+    probes: Optional[int] = Field(default=None, ge=1, description="Inverted lists scored per query (approximate only)")
+
+class IndexRequest(BaseModel):
+    lists: Optional[int] = Field(default=None, ge=1, description="Number of k-means lists (default: sqrt(count))")
+
+class CollectionInfo(BaseModel):
+    name: str
+    count: int
+    dimensions: int
+    indexed: bool
+    lists: int
+
+class UpsertResponse(BaseModel):
+    added: int
+    updated: int
+    count: int
+
+class DeleteResponse(BaseModel):
+    deleted: int
+    count: int
+
+class SearchHit(BaseModel):
+    id: str
+    score: float
+    text: Optional[str]
+    metadata: Optional[dict]
+
+class SearchResponse(BaseModel):
+    results: List[List[SearchHit]]
+    approximate: bool
 
 # Endpoints
 @app.get("/", response_model=HealthResponse)
@@ -84,7 +1442,8 @@ async def root():
     """Root endpoint - returns API status"""
     return {
         "status": "online",
-        "model": "sentence-transformers/LaBSE",
+        "model": MODEL_NAME,
+        "backend": BACKEND,
         "dimensions": 768
     }
 
@@ -95,16 +1454,23 @@ async def health_check():
         raise HTTPException(status_code=503, detail="Model not loaded")
     return {
         "status": "healthy",
-        "model": "sentence-transformers/LaBSE",
+        "model": MODEL_NAME,
+        "backend": BACKEND,
         "dimensions": 768
     }
 
-@app.post("/embeddings", response_model=EmbeddingResponse)
-async def get_embeddings(request: EmbeddingRequest):
+@app.post(
+    "/embeddings",
+    response_model=EmbeddingResponse,
+    responses={200: {"content": {"application/octet-stream": {}}}},
+)
+async def get_embeddings(request: EmbeddingRequest, http_request: Request):
     """
     Generate embeddings for text(s) using LaBSE model.
     
     Supports 109 languages and returns 768-dimensional vectors.
+    JSON lists are the default; base64 and raw binary encodings in
+    float32, float16 or int8 carry shape and dtype metadata.
     """
     if model is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
@@ -122,24 +1488,534 @@ async def get_embeddings(request: EmbeddingRequest):
         
         if len(texts) > 100:
             raise HTTPException(status_code=400, detail="Maximum 100 texts allowed per request")
+
+        encoding = request.encoding
+        if encoding is None:
+            accept = http_request.headers.get("accept", "")
+            encoding = "binary" if "application/octet-stream" in accept else "json"
+        if encoding == "json" and request.dtype != "float32":
+            raise HTTPException(status_code=400, detail="dtype requires base64 or binary encoding")
         
-        # Generate embeddings
+        # Generate embeddings; cache misses from concurrent requests share one encode call
         logger.info(f"Generating embeddings for {len(texts)} text(s)")
-        embeddings = model.encode(texts, normalize_embeddings=request.normalize)
-        
-        # Convert to list format
-        embeddings_list = embeddings.tolist()
+        try:
+            embeddings, cached = await embed_texts(texts, request.normalize)
+        except BatcherSaturated:
+            raise HTTPException(
+                status_code=429,
+                detail="Embedding queue is full, retry later",
+                headers={"Retry-After": "1"},
+            )
         
-        return {
-            "embeddings": embeddings_list,
-            "dimensions": embeddings.shape[1],
-            "count": len(embeddings_list)
-        }
+        return embeddings_response(embeddings, encoding, request.dtype, cached)
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating embeddings: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def spool_request_body(request: Request):
+    """
+    Copy the request body into a spooled temp file (in memory up to 8 MB, then on disk).
+
+    The body has to be drained before the streaming response starts, because
+    StreamingResponse listens for client disconnects on the same receive channel.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def iter_ndjson_lines(spool):
+    """Yield non-empty lines of a spooled NDJSON body"""
+    for line in spool:
+        if line.strip():
+            yield line
+
+
+def parse_bulk_line(line: bytes, index: int) -> Tuple[object, str]:
+    """Parse one bulk input line: {"id": ..., "text": ...} or a bare JSON string"""
+    item = json.loads(line)
+    if isinstance(item, str):
+        return index, item
+    if not isinstance(item, dict) or not isinstance(item.get("text"), str):
+        raise ValueError('expected {"id": ..., "text": "..."} or a JSON string')
+    return item.get("id", index), item["text"]
+
+
+async def embed_with_backoff(texts: List[str], normalize: bool) -> Tuple[np.ndarray, int]:
+    """embed_texts for bulk callers: wait for queue space instead of failing with 429"""
+    delay = 0.01
+    while True:
+        try:
+            return await embed_texts(texts, normalize)
+        except BatcherSaturated:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+
+async def render_bulk_batch(batch: List[Tuple[object, Optional[str], Optional[str]]],
+                            normalize: bool, encoding: str, dtype: str) -> bytes:
+    """Embed one batch of (id, text, error) items and render it as NDJSON, preserving order"""
+    texts = [text for _, text, error in batch if error is None]
+    embeddings, _ = await embed_with_backoff(texts, normalize) if texts else (None, 0)
+
+    lines = []
+    row = 0
+    for item_id, _, error in batch:
+        if error is not None:
+            record = {"id": item_id, "error": error}
+        else:
+            vector = embeddings[row:row + 1]
+            row += 1
+            if encoding == "base64":
+                data, scales = pack_embeddings(vector, dtype)
+                record = {"id": item_id, "data": base64.b64encode(data).decode("ascii")}
+                if scales is not None:
+                    record["scale"] = float(np.frombuffer(scales, dtype="<f4")[0])
+            else:
+                record = {"id": item_id, "embedding": vector[0].tolist()}
+        lines.append(json.dumps(record, ensure_ascii=False))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+SENTENCE_END = re.compile(r"[^.!?…。！？\n]*(?:[.!?…。！？]+[\"'»”)\]]*|\n+|$)")
+
+
+class DocumentUnit:
+    """A sentence or Whisper segment: character span in the document, optional time span"""
+
+    def __init__(self, start: int, end: int, start_time: Optional[float] = None, end_time: Optional[float] = None):
+        self.start = start
+        self.end = end
+        self.start_time = start_time
+        self.end_time = end_time
+
+
+def split_sentences(text: str) -> List[DocumentUnit]:
+    """Sentence spans of text, whitespace trimmed"""
+    units = []
+    for match in SENTENCE_END.finditer(text):
+        start, end = match.span()
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            units.append(DocumentUnit(start, end))
+    return units
+
+
+def join_segments(segments: List["TranscriptSegment"]) -> Tuple[str, List[DocumentUnit]]:
+    """Join Whisper segments with spaces; each segment becomes a unit with its times"""
+    parts = []
+    units = []
+    offset = 0
+    for segment in segments:
+        text = segment.text.strip()
+        if not text:
+            continue
+        if parts:
+            offset += 1
+        units.append(DocumentUnit(offset, offset + len(text), segment.start, segment.end))
+        parts.append(text)
+        offset += len(text)
+    return " ".join(parts), units
+
+
+def token_windows(first: int, last: int, size: int, overlap: int) -> List[Tuple[int, int]]:
+    """Token index ranges [begin, end) of at most size tokens over tokens first..last-1"""
+    windows = []
+    begin = first
+    while begin < last:
+        end = min(begin + size, last)
+        windows.append((begin, end))
+        if end == last:
+            break
+        begin = end - overlap
+    return windows
+
+
+def plan_document_chunks(units: List[DocumentUnit], token_spans: List[Tuple[int, int]], mode: str,
+                         max_tokens: int, overlap_tokens: int) -> List[Tuple[int, int]]:
+    """
+    Character spans of chunks of at most max_tokens tokens.
+
+    tokens mode slides a window over the document tokens. sentences mode packs
+    whole units (sentences or segments) and starts each chunk with trailing
+    units of the previous one worth up to overlap_tokens; a unit longer than
+    max_tokens is split into token windows.
+    """
+    starts = [start for start, _ in token_spans]
+
+    def unit_tokens(unit):
+        return bisect.bisect_left(starts, unit.end) - bisect.bisect_left(starts, unit.start)
+
+    def window_spans(first, last, overlap):
+        return [
+            (token_spans[begin][0], token_spans[end - 1][1])
+            for begin, end in token_windows(first, last, max_tokens, overlap)
+        ]
+
+    if mode == "tokens":
+        return window_spans(0, len(token_spans), overlap_tokens)
+
+    chunks = []
+    current: List[Tuple[DocumentUnit, int]] = []
+    size = 0
+    for unit in units:
+        tokens = unit_tokens(unit)
+        if tokens > max_tokens:
+            if current:
+                chunks.append((current[0][0].start, current[-1][0].end))
+                current, size = [], 0
+            first = bisect.bisect_left(starts, unit.start)
+            chunks.extend(window_spans(first, first + tokens, 0))
+            continue
+        if current and size + tokens > max_tokens:
+            chunks.append((current[0][0].start, current[-1][0].end))
+            carried: List[Tuple[DocumentUnit, int]] = []
+            carried_size = 0
+            for previous in reversed(current):
+                if carried_size + previous[1] > overlap_tokens or carried_size + previous[1] + tokens > max_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_size += previous[1]
+            current, size = carried, carried_size
+        current.append((unit, tokens))
+        size += tokens
+    if current:
+        chunks.append((current[0][0].start, current[-1][0].end))
+    return chunks
+
+
+def chunk_times(units: List[DocumentUnit], start: int, end: int) -> Tuple[Optional[float], Optional[float]]:
+    """Time span of the units overlapping a character span"""
+    times = [(unit.start_time, unit.end_time) for unit in units
+             if unit.start_time is not None and unit.start < end and unit.end > start]
+    if not times:
+        return None, None
+    return min(t[0] for t in times), max(t[1] for t in times)
+
+
+def document_units(text: Optional[str], segments: Optional[List["TranscriptSegment"]]) -> Tuple[str, List[DocumentUnit]]:
+    """Document text and its sentence (or segment) units from either input form"""
+    if (text is None) == (segments is None):
+        raise HTTPException(status_code=400, detail="Provide either text or segments")
+    if segments is not None:
+        text, units = join_segments(segments)
+    else:
+        units = split_sentences(text)
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Document is empty")
+    return text, units
+
+
+async def embed_document(text: str, units: List[DocumentUnit], options: "ChunkingOptions",
+                         wait: bool = False) -> Tuple[List[dict], np.ndarray, int]:
+    """
+    Chunk a document to fit the model's sequence length and embed every chunk.
+
+    Returns chunk descriptions (text, character/time offsets, token count),
+    their embeddings and how many came from the cache. With wait, a full
+    batcher queue is retried with backoff instead of raising a 429.
+    """
+    limit = model.max_seq_length - 2
+    max_tokens = min(options.max_tokens or limit, limit)
+    if options.overlap_tokens >= max_tokens:
+        raise HTTPException(status_code=400, detail="overlap_tokens must be smaller than max_tokens")
+
+    token_spans = await asyncio.to_thread(token_encoder.token_spans, text)
+    spans = plan_document_chunks(units, token_spans, options.chunk_by, max_tokens, options.overlap_tokens)
+    texts = [text[start:end] for start, end in spans]
+
+    # Slices are submitted together so the batcher can pack them into full batches
+    embed = embed_with_backoff if wait else embed_texts
+    try:
+        results = await asyncio.gather(*[
+            embed(texts[i:i + MAX_BATCH_SIZE], options.normalize)
+            for i in range(0, len(texts), MAX_BATCH_SIZE)
+        ])
+    except BatcherSaturated:
+        raise HTTPException(status_code=429, detail="Embedding queue is full, retry later", headers={"Retry-After": "1"})
+    embeddings = np.concatenate([vectors for vectors, _ in results])
+    cached = sum(count for _, count in results)
+
+    starts = [start for start, _ in token_spans]
+    chunks = []
+    for index, (start, end) in enumerate(spans):
+        start_time, end_time = chunk_times(units, start, end)
+        chunks.append({
+            "index": index,
+            "text": texts[index],
+            "start_char": start,
+            "end_char": end,
+            "start_time": start_time,
+            "end_time": end_time,
+            "tokens": bisect.bisect_left(starts, end) - bisect.bisect_left(starts, start),
+        })
+    return chunks, embeddings, cached
+
+
+@app.post("/embeddings/document", response_model=DocumentResponse)
+async def document_embeddings(request: DocumentRequest):
+    """
+    Chunk a long document or Whisper segment list and embed every chunk.
+
+    LaBSE silently truncates input past its sequence length, so long
+    transcripts are split into chunks that fit, with character offsets
+    (and segment times for Whisper input) for each chunk. Chunks are
+    embedded through the shared batcher and cache.
+    """
+    if model is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    text, units = document_units(request.text, request.segments)
+    chunks, embeddings, cached = await embed_document(text, units, request)
+    for chunk, embedding in zip(chunks, embeddings):
+        chunk["embedding"] = embedding.tolist()
+
+    document_embedding = None
+    if request.pool:
+        weights = np.maximum([chunk["tokens"] for chunk in chunks], 1)
+        pooled = np.average(embeddings, axis=0, weights=weights)
+        if request.normalize:
+            pooled = normalize_rows(pooled[None, :])[0]
+        document_embedding = pooled.tolist()
+
+    logger.info(f"Document of {len(text)} chars embedded as {len(chunks)} chunk(s)")
+    # Vectors are plain lists already; skip response model validation like /embeddings
+    return JSONResponse({
+        "chunks": chunks,
+        "document_embedding": document_embedding,
+        "dimensions": int(embeddings.shape[1]),
+        "count": len(chunks),
+        "cached": cached,
+    })
+
+@app.post("/index/{index}", status_code=202, response_model=ElasticsearchIndexResponse)
+async def index_documents(index: str, request: ElasticsearchIndexRequest):
+    """
+    Chunk, embed and queue transcripts for indexing into Elasticsearch.
+
+    Every chunk becomes one Elasticsearch document (text, offsets, embedding,
+    metadata) with id <document id>#<chunk>; chunks are written by the
+    background _bulk sink, so the response only confirms they were queued.
+    Progress and throughput are reported by /metrics.
+    """
+    if model is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if es_sink is None:
+        raise HTTPException(status_code=503, detail="Elasticsearch sink is disabled (set LABSE_ES_URL)")
+    if not ES_INDEX_NAME.match(index):
+        raise HTTPException(status_code=400, detail="Invalid Elasticsearch index name")
+
+    documents = [(document, *document_units(document.text, document.segments)) for document in request.documents]
+    # A request may hold up to 1000 documents: embed a few at a time and wait for queue
+    # space, so one large request neither fills the batcher queue nor fails with 429
+    slots = asyncio.Semaphore(max(1, batcher.max_queued // 8) if batcher.max_queued else len(documents))
+
+    async def embed_one(text: str, units: List[DocumentUnit]):
+        async with slots:
+            return await embed_document(text, units, request, wait=True)
+
+    embedded = await asyncio.gather(*[embed_one(text, units) for _, text, units in documents])
+
+    actions = []
+    for (document, _, _), (chunks, embeddings, _) in zip(documents, embedded):
+        for chunk, embedding in zip(chunks, embeddings):
+            actions.append((index, f"{document.id}#{chunk['index']}", {
+                "document_id": document.id,
+                "chunk": chunk["index"],
+                "text": chunk["text"],
+                "start_char": chunk["start_char"],
+                "end_char": chunk["end_char"],
+                "start_time": chunk["start_time"],
+                "end_time": chunk["end_time"],
+                "embedding": embedding.tolist(),
+                "metadata": document.metadata,
+            }))
+    try:
+        es_sink.submit(actions)
+    except SinkSaturated:
+        raise HTTPException(status_code=429, detail="Indexing buffer is full, retry later", headers={"Retry-After": "5"})
+    logger.info(f"Queued {len(actions)} chunk(s) of {len(documents)} document(s) for index {index}")
+    return {"documents": len(documents), "queued": len(actions)}
+
+@app.post("/embeddings/bulk")
+async def bulk_embeddings(
+    request: Request,
+    normalize: bool = True,
+    encoding: Literal["json", "base64"] = "json",
+    dtype: Literal["float32", "float16", "int8"] = "float32",
+):
+    """
+    Stream embeddings for an NDJSON body of arbitrary length.
+
+    Each input line is {"id": ..., "text": "..."} or a bare JSON string (its
+    id is then the line index). Texts are encoded internally in batches of
+    LABSE_BULK_BATCH_SIZE and streamed back as NDJSON in input order, one
+    {"id": ..., "embedding": [...]} line per input (base64 encoding: "data",
+    plus "scale" for int8). Invalid lines produce {"id": ..., "error": ...}.
+    Memory stays bounded: the body is spooled to disk and only a few
+    batches are held at any time.
+    """
+    if model is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if encoding == "json" and dtype != "float32":
+        raise HTTPException(status_code=400, detail="dtype requires base64 encoding")
+
+    spool = await spool_request_body(request)
+
+    async def generate():
+        pending = deque()
+        batch = []
+        index = 0
+        try:
+            for line in iter_ndjson_lines(spool):
+                try:
+                    item_id, text = parse_bulk_line(line, index)
+                    batch.append((item_id, text, None))
+                except ValueError as e:
+                    batch.append((index, None, f"invalid line: {e}"))
+                index += 1
+
+                if len(batch) >= BULK_BATCH_SIZE:
+                    pending.append(asyncio.create_task(render_bulk_batch(batch, normalize, encoding, dtype)))
+                    batch = []
+                    # Keep reading ahead while earlier batches encode, but bound buffered work
+                    while len(pending) > BULK_MAX_IN_FLIGHT:
+                        yield await pending.popleft()
+
+            if batch:
+                pending.append(asyncio.create_task(render_bulk_batch(batch, normalize, encoding, dtype)))
+            while pending:
+                yield await pending.popleft()
+            logger.info(f"Bulk embeddings streamed for {index} line(s)")
+        finally:
+            for task in pending:
+                task.cancel()
+            spool.close()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+def get_collection(name: str, create: bool = False) -> VectorCollection:
+    if collection_store is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if not COLLECTION_NAME.match(name):
+        raise HTTPException(status_code=400, detail="Collection names may contain letters, digits, '_' and '-'")
+    collection = collection_store.get(name, create=create)
+    if collection is None:
+        raise HTTPException(status_code=404, detail=f"Collection {name!r} not found")
+    return collection
+
+
+async def store_items(name: str, request: CollectionItemsRequest, add_only: bool) -> dict:
+    collection = get_collection(name, create=True)
+    items = request.items
+    try:
+        vectors, _ = await embed_texts([item.text for item in items], True)
+    except BatcherSaturated:
+        raise HTTPException(status_code=429, detail="Embedding queue is full, retry later", headers={"Retry-After": "1"})
+    try:
+        added, updated = await asyncio.to_thread(
+            collection.upsert,
+            [item.id for item in items],
+            vectors.astype(np.float32),
+            [item.text for item in items],
+            [item.metadata for item in items],
+            add_only,
+        )
+    except KeyError as e:
+        raise HTTPException(status_code=409, detail=f"Items already exist: {', '.join(e.args[0][:10])}")
+    return {"added": added, "updated": updated, "count": collection.count}
+
+
+@app.get("/collections", response_model=List[CollectionInfo])
+async def list_collections():
+    """List vector collections"""
+    if collection_store is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    return [{"name": name, **collection_store.get(name).info()} for name in collection_store.names()]
+
+@app.get("/collections/{name}", response_model=CollectionInfo)
+async def collection_info(name: str):
+    """Collection size, dimensions and approximate index state"""
+    return {"name": name, **get_collection(name).info()}
+
+@app.delete("/collections/{name}")
+async def drop_collection(name: str):
+    """Delete a collection with all its vectors"""
+    get_collection(name)
+    await asyncio.to_thread(collection_store.drop, name)
+    return {"deleted": name}
+
+@app.post("/collections/{name}/items", response_model=UpsertResponse)
+async def add_items(name: str, request: CollectionItemsRequest):
+    """Embed and add items; fails with 409 if any id already exists. Creates the collection."""
+    return await store_items(name, request, add_only=True)
+
+@app.put("/collections/{name}/items", response_model=UpsertResponse)
+async def upsert_items(name: str, request: CollectionItemsRequest):
+    """Embed and insert or replace items by id. Creates the collection."""
+    return await store_items(name, request, add_only=False)
+
+@app.post("/collections/{name}/items/delete", response_model=DeleteResponse)
+async def delete_items(name: str, request: DeleteItemsRequest):
+    """Delete items by id; unknown ids are ignored"""
+    collection = get_collection(name)
+    deleted = await asyncio.to_thread(collection.delete, request.ids)
+    return {"deleted": deleted, "count": collection.count}
+
+@app.post("/collections/{name}/index", response_model=CollectionInfo)
+async def build_collection_index(name: str, request: IndexRequest):
+    """(Re)build the approximate inverted-file index of a collection"""
+    collection = get_collection(name)
+    try:
+        await asyncio.to_thread(collection.build_index, request.lists)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"name": name, **collection.info()}
+
+@app.post("/collections/{name}/search", response_model=SearchResponse)
+async def search_collection(name: str, request: SearchRequest):
+    """
+    Top-k cosine search over a collection.
+
+    Queries are embedded like /embeddings (normalized, cached) and scored
+    exactly with a vectorized scan, or through the approximate index when
+    the collection has one and approximate is not false.
+    """
+    collection = get_collection(name)
+    queries = [request.query] if isinstance(request.query, str) else request.query
+    if not queries or len(queries) > 100:
+        raise HTTPException(status_code=400, detail="Provide 1 to 100 queries")
+    approximate = request.approximate
+    if approximate is None:
+        approximate = collection.centroids is not None
+    elif approximate and collection.centroids is None:
+        raise HTTPException(status_code=400, detail="Collection has no approximate index, build it first")
+    try:
+        vectors, _ = await embed_texts(queries, True)
+    except BatcherSaturated:
+        raise HTTPException(status_code=429, detail="Embedding queue is full, retry later", headers={"Retry-After": "1"})
+    probes = (request.probes or ANN_PROBES) if approximate else None
+    results = await asyncio.to_thread(collection.search, vectors.astype(np.float32), request.k, probes)
+    return {"results": results, "approximate": approximate}
+
+@app.get("/metrics", response_model=MetricsResponse)
+async def metrics():
+    """Dynamic batching and embedding cache metrics"""
+    if batcher is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    return {
+        "batching": {**batcher.metrics(), **token_encoder.metrics()},
+        "cache": embedding_cache.metrics(),
+        "elasticsearch": es_sink.metrics() if es_sink is not None else None,
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8080)
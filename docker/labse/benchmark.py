@@ -0,0 +1,112 @@
+"""
+Benchmark: length-bucketed token-budget batching vs. item-count batching
+
+Builds a synthetic workload shaped like the traffic the service sees: a
+mix of short search queries (1-8 words) and transcript chunks with
+log-normally distributed lengths (tens to a few hundred words), shuffled
+together and cut into merged batches of --batch-size texts, as the
+dynamic batcher would deliver them.
+
+Each merged batch is encoded twice with the same model:
+
+- item-count: model.encode(texts) on the whole batch (the previous path)
+- token-budget: app.TokenBudgetEncoder, which sorts by token length and
+  splits the batch into passes of at most --token-budget padded tokens
+
+and the script reports texts/s, padding efficiency (real tokens / padded
+tokens) and the maximum difference between the two outputs, which checks
+that results come back in the original order.
+
+Usage:
+    python benchmark.py --texts 2048 --query-share 0.4 --batch-size 64 --token-budget 8192 4096 16384
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+import app
+
+WORDS = (
+    "the of and to in is that it was for on are as with his they at be this from have or by one had not but what "
+    "all were when we there can an your which their said if do will each about how up out them then she many some "
+    "so these would other into has more her two like him see time could no make than first been its who now people "
+    "my made over did down only way find use may water long little very after words called just where most know"
+).split()
+
+
+def make_workload(count, query_share, seed):
+    """Shuffled mix of short queries and transcript chunks"""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        if rng.random() < query_share:
+            length = rng.randint(1, 8)
+        else:
+            # Median ~90 words, long tail up to the model's 512-token limit
+            length = min(max(int(rng.lognormvariate(4.5, 0.6)), 10), 400)
+        texts.append(" ".join(rng.choice(WORDS) for _ in range(length)))
+    return texts
+
+
+def padding_efficiency(lengths, groups):
+    real = sum(lengths)
+    padded = sum(max(lengths[i] for i in group) * len(group) for group in groups)
+    return real / padded
+
+
+def run(label, encode, batches):
+    encode(batches[0])  # warm-up
+    started = time.perf_counter()
+    outputs = [encode(batch) for batch in batches]
+    elapsed = time.perf_counter() - started
+    texts = sum(len(batch) for batch in batches)
+    print(f"{label:24} {elapsed:8.2f}s  {texts / elapsed:8.1f} texts/s")
+    return np.concatenate(outputs), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=2048, help="Number of texts in the workload")
+    parser.add_argument("--query-share", type=float, default=0.4, help="Share of short queries (default: 0.4)")
+    parser.add_argument("--batch-size", type=int, default=app.MAX_BATCH_SIZE, help="Texts per merged batch")
+    parser.add_argument("--token-budget", type=int, nargs="+", default=[app.TOKEN_BUDGET],
+                        help="Token budgets to benchmark")
+    parser.add_argument("--backend", default=app.BACKEND, choices=app.BACKENDS, help="Inference backend")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    model = app.load_embedding_model(args.backend)
+    texts = make_workload(args.texts, args.query_share, args.seed)
+    batches = [texts[i:i + args.batch_size] for i in range(0, len(texts), args.batch_size)]
+
+    lengths_encoder = app.TokenBudgetEncoder(model, 0)
+    lengths = [lengths_encoder.token_lengths(batch) for batch in batches]
+    flat = [length for batch_lengths in lengths for length in batch_lengths]
+    print(f"{len(texts)} texts in {len(batches)} batches of {args.batch_size}, backend {args.backend}; "
+          f"tokens p50 {int(np.percentile(flat, 50))}, p95 {int(np.percentile(flat, 95))}, max {max(flat)}")
+
+    # sentence-transformers sorts by character length and encodes in fixed chunks of 32 items
+    item_count_efficiency = np.mean([
+        padding_efficiency(batch_lengths, [
+            sorted(range(len(batch_lengths)), key=lambda i: -len(batch[i]))[j:j + 32]
+            for j in range(0, len(batch_lengths), 32)
+        ])
+        for batch, batch_lengths in zip(batches, lengths)
+    ])
+    reference, baseline = run(
+        "item-count", lambda batch: model.encode(batch, normalize_embeddings=False, convert_to_numpy=True), batches
+    )
+    print(f"{'':24} padding efficiency {item_count_efficiency:.1%}")
+
+    for budget in args.token_budget:
+        encoder = app.TokenBudgetEncoder(model, budget)
+        embeddings, elapsed = run(f"token-budget {budget}", encoder, batches)
+        max_diff = float(np.abs(embeddings - reference).max())
+        print(f"{'':24} padding efficiency {encoder.metrics()['padding_efficiency']:.1%}  "
+              f"passes {encoder.forward_passes}  speedup {baseline / elapsed:.2f}x  max |diff| {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Local HTTP stand-in for Elasticsearch
+
+Implements just enough of the Elasticsearch API to exercise the service's
+_bulk sink without a cluster: PUT /<index> (index creation, 400 if it
+exists), POST /_bulk (NDJSON actions, per-item results) and GET / (cluster
+info). It can inject throttling to check the sink's backoff:
+
+- --reject-requests: share of _bulk requests answered with HTTP 429
+- --reject-items: share of items rejected with status 429 inside a 200 response
+- --latency-ms: delay added to every _bulk request
+
+GET /_standin/stats reports received documents per index, bulk requests,
+rejections and the number of TCP connections opened (which stays at the
+sink's pool size when keep-alive works).
+
+Uses only the standard library.
+
+Usage:
+    python es_standin.py --port 9200 --reject-requests 0.1 --reject-items 0.05
+    LABSE_ES_URL=http://localhost:9200 uvicorn app:app --port 8080
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandinState:
+    def __init__(self, reject_requests, reject_items, latency_ms, seed):
+        self.reject_requests = reject_requests
+        self.reject_items = reject_items
+        self.latency = latency_ms / 1000
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.indices = {}
+        self.documents = Counter()
+        self.stats = Counter()
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.stats["connections"] += 1
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if status == 429:
+                self.send_header("Retry-After", "1")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def read_body(self):
+            length = int(self.headers.get("Content-Length", 0))
+            return self.rfile.read(length) if length else b""
+
+        def do_GET(self):
+            if self.path == "/_standin/stats":
+                with state.lock:
+                    self.send_json(200, {**state.stats, "documents": dict(state.documents)})
+            else:
+                self.send_json(200, {"name": "es-standin", "version": {"number": "9.1.2"}})
+
+        def do_PUT(self):
+            index = self.path.strip("/")
+            mapping = json.loads(self.read_body() or b"{}")
+            with state.lock:
+                if index in state.indices:
+                    self.send_json(400, {"error": {"type": "resource_already_exists_exception"}, "status": 400})
+                    return
+                state.indices[index] = mapping
+            self.send_json(200, {"acknowledged": True, "index": index})
+
+        def do_POST(self):
+            if self.path != "/_bulk":
+                self.send_json(404, {"error": f"no handler for {self.path}"})
+                return
+            lines = self.read_body().splitlines()
+            if state.latency:
+                time.sleep(state.latency)
+            with state.lock:
+                state.stats["bulk_requests"] += 1
+                if state.random.random() < state.reject_requests:
+                    state.stats["rejected_requests"] += 1
+                    self.send_json(429, {"error": {"type": "es_rejected_execution_exception"}, "status": 429})
+                    return
+                items = []
+                for action_line, source_line in zip(lines[::2], lines[1::2]):
+                    action = json.loads(action_line)["index"]
+                    json.loads(source_line)
+                    if state.random.random() < state.reject_items:
+                        state.stats["rejected_items"] += 1
+                        items.append({"index": {"_id": action["_id"], "status": 429,
+                                                "error": {"type": "es_rejected_execution_exception"}}})
+                    else:
+                        state.documents[action["_index"]] += 1
+                        items.append({"index": {"_id": action["_id"], "status": 201, "result": "created"}})
+            errors = any(item["index"]["status"] >= 300 for item in items)
+            self.send_json(200, {"took": 1, "errors": errors, "items": items})
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--reject-requests", type=float, default=0.0, help="Share of _bulk requests answered with 429")
+    parser.add_argument("--reject-items", type=float, default=0.0, help="Share of items rejected with 429")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every _bulk request")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    state = StandinState(args.reject_requests, args.reject_items, args.latency_ms, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"Elasticsearch stand-in listening on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Load test: /health latency while /embeddings is saturated
+
+Measures /health latency on an idle service, then again while several
+clients keep sending large /embeddings batches. With inference running
+in the dedicated executor, health latency should stay flat under load;
+if encoding blocked the event loop, it would grow to the duration of an
+encode call. Rejected requests (429) are counted separately.
+
+Uses only the standard library, so it can run from any container on the
+Docker network or from the host.
+
+Usage:
+    python loadtest.py --url http://localhost:8080 --clients 8 --batch 100 --duration 30
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+SAMPLE_TEXTS = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Съешь же ещё этих мягких французских булок, да выпей чаю.",
+    "El veloz murciélago hindú comía feliz cardillo y kiwi.",
+    "Victor jagt zwölf Boxkämpfer quer über den großen Sylter Deich.",
+]
+
+
+def timed_get(url, timeout):
+    started = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        response.read()
+    return (time.perf_counter() - started) * 1000
+
+
+def probe_health(base_url, duration, interval, timeout):
+    """Poll /health for duration seconds and return latencies in ms"""
+    latencies = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        try:
+            latencies.append(timed_get(f"{base_url}/health", timeout))
+        except (urllib.error.URLError, TimeoutError):
+            latencies.append(timeout * 1000)
+        time.sleep(interval)
+    return latencies
+
+
+def embedding_client(base_url, batch, stop, counters, lock):
+    payload = json.dumps({"texts": [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] * 8 for i in range(batch)]}).encode()
+    while not stop.is_set():
+        request = urllib.request.Request(
+            f"{base_url}/embeddings", data=payload, headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=300) as response:
+                response.read()
+            key = "ok"
+        except urllib.error.HTTPError as e:
+            key = "rejected" if e.code in (429, 503) else "errors"
+        except (urllib.error.URLError, TimeoutError):
+            key = "errors"
+        with lock:
+            counters[key] += 1
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    return {
+        "samples": len(ordered),
+        "p50_ms": round(statistics.median(ordered), 2),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1], 2),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8080", help="Service base URL")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent /embeddings clients")
+    parser.add_argument("--batch", type=int, default=100, help="Texts per /embeddings request")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument("--interval", type=float, default=0.1, help="Seconds between health probes")
+    parser.add_argument("--timeout", type=float, default=5, help="Health probe timeout in seconds")
+    args = parser.parse_args()
+    base_url = args.url.rstrip("/")
+
+    idle = summarize(probe_health(base_url, min(args.duration, 5), args.interval, args.timeout))
+    print(f"idle   /health: {idle}")
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    counters = {"ok": 0, "rejected": 0, "errors": 0}
+    clients = [
+        threading.Thread(target=embedding_client, args=(base_url, args.batch, stop, counters, lock), daemon=True)
+        for _ in range(args.clients)
+    ]
+    for client in clients:
+        client.start()
+    # Let the queue fill before measuring
+    time.sleep(1)
+    loaded = summarize(probe_health(base_url, args.duration, args.interval, args.timeout))
+    stop.set()
+    for client in clients:
+        client.join()
+
+    print(f"loaded /health: {loaded}")
+    print(f"embedding requests: {counters}")
+    ratio = loaded["p95_ms"] / idle["p95_ms"] if idle["p95_ms"] else float("inf")
+    print(f"p95 health latency under load: {ratio:.1f}x idle")
+
+
+if __name__ == "__main__":
+    main()
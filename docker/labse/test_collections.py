@@ -0,0 +1,59 @@
+"""
+Tests for VectorCollection storage
+
+Uses only the standard library test runner and a temporary directory, no model:
+
+    python -m unittest test_collections
+"""
+import tempfile
+import unittest
+
+import numpy as np
+
+import app
+
+
+def unit_vectors(count, dimensions=8, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class VectorCollectionDeleteTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.collection = app.VectorCollection(self.directory.name, 8)
+        self.ids = [f"i{n}" for n in range(6)]
+        self.vectors = unit_vectors(len(self.ids))
+        self.collection.upsert(self.ids, self.vectors, [None] * 6, [None] * 6)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assert_consistent(self, expected_ids):
+        collection = self.collection
+        rows = collection._rows(expected_ids)
+        self.assertEqual(collection.count, len(expected_ids))
+        self.assertEqual(sorted(rows.values()), list(range(len(expected_ids))))
+        for item_id, row in rows.items():
+            np.testing.assert_array_equal(collection._vectors[row], self.vectors[self.ids.index(item_id)])
+        # Every stored vector is still found as its own nearest neighbour
+        for item_id in expected_ids:
+            query = self.vectors[self.ids.index(item_id)][None, :]
+            self.assertEqual(collection.search(query, 1)[0][0]["id"], item_id)
+
+    def test_delete_several_ids_including_last_row(self):
+        self.assertEqual(self.collection.delete(["i1", "i5"]), 2)
+        self.assert_consistent(["i0", "i2", "i3", "i4"])
+
+    def test_delete_rows_that_would_fill_each_other(self):
+        self.assertEqual(self.collection.delete(["i0", "i4", "i5", "i2", "missing", "i0"]), 4)
+        self.assert_consistent(["i1", "i3"])
+
+    def test_delete_survives_reopen(self):
+        self.collection.delete(["i1", "i5"])
+        self.collection = app.VectorCollection(self.directory.name, 8)
+        self.assert_consistent(["i0", "i2", "i3", "i4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
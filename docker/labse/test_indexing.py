@@ -0,0 +1,65 @@
+"""
+Tests for POST /index/{index} fan-out
+
+Runs the endpoint against the real batcher with a stand-in model, tokenizer
+and Elasticsearch sink, so no model download or Elasticsearch is needed:
+
+    python -m unittest test_indexing
+"""
+import re
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+
+import app
+
+
+class WordSpans:
+    """Stand-in for TokenBudgetEncoder.token_spans: one token per word"""
+
+    def token_spans(self, text):
+        return [match.span() for match in re.finditer(r"\S+", text)]
+
+
+class RecordingSink:
+    def __init__(self):
+        self.actions = []
+
+    def submit(self, actions):
+        self.actions.extend(actions)
+
+
+def encode(texts):
+    return np.stack([np.random.default_rng(len(text)).standard_normal(8).astype(np.float32) for text in texts])
+
+
+class IndexDocumentsTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.saved = app.model, app.token_encoder, app.batcher, app.embedding_cache, app.es_sink
+        app.model = SimpleNamespace(max_seq_length=128)
+        app.token_encoder = WordSpans()
+        app.batcher = app.EmbeddingBatcher(encode, max_batch_size=4, max_wait_ms=1, max_queued=16)
+        app.batcher.start()
+        app.embedding_cache = app.EmbeddingCache(0)
+        app.es_sink = RecordingSink()
+
+    async def asyncTearDown(self):
+        await app.batcher.stop()
+        app.model, app.token_encoder, app.batcher, app.embedding_cache, app.es_sink = self.saved
+
+    async def test_more_documents_than_queue_slots(self):
+        documents = [{"id": f"d{n}", "text": f"Document number {n} is short."} for n in range(400)]
+        request = app.ElasticsearchIndexRequest(documents=documents)
+
+        response = await app.index_documents("transcripts", request)
+
+        self.assertEqual(response, {"documents": 400, "queued": 400})
+        self.assertEqual(app.batcher.rejected, 0)
+        self.assertEqual([action[1] for action in app.es_sink.actions], [f"d{n}#0" for n in range(400)])
+        for action in app.es_sink.actions:
+            self.assertEqual(len(action[2]["embedding"]), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
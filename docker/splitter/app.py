@@ -1,22 +1,53 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydub import AudioSegment
-from typing import List
-from datetime import datetime
+from typing import Awaitable, Callable, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from multiprocessing import get_context
 from pathlib import Path
+import asyncio
+import hashlib
 import io
+import json
 import logging
+import math
 import os
 import re
+import shutil
+import tempfile
+import time
 import uuid
 
+import numpy as np
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Chunks are encoded in parallel: memory mode in a process pool of ENCODE_WORKERS
+# processes, stream mode as up to ENCODE_WORKERS concurrent ffmpeg processes.
+ENCODE_WORKERS = int(os.environ.get("SPLITTER_ENCODE_WORKERS", str(os.cpu_count() or 1)))
+# Decoded chunks waiting for (or in) a worker; bounds memory held in PCM copies
+MAX_CHUNKS_IN_FLIGHT = ENCODE_WORKERS * 2
+
+encode_pool: Optional[ProcessPoolExecutor] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(output_cache.scan)
+    collector = asyncio.create_task(output_cache.run_collector())
+    yield
+    collector.cancel()
+    if encode_pool is not None:
+        encode_pool.shutdown(wait=True)
+
+
 app = FastAPI(
     title="Audio Splitter API",
     description="Upload an audio file and receive chunked parts.",
     version="2.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -42,33 +73,582 @@ except Exception as exc:  # pragma: no cover - protects startup when volume misc
 
 SAFE_FILENAME_RE = re.compile(r"[^A-Za-z0-9._-]+")
 
+# Results are content-addressed: CACHE_ROOT/<key[:2]>/<key>/ where the key hashes the
+# upload bytes and every parameter that changes the output, so repeating a request
+# returns the stored manifest.json. Entries not used for CACHE_MAX_AGE seconds are
+# removed, and least recently used entries go first while the cache is above
+# CACHE_MAX_BYTES (0 disables a limit). Entries used within CACHE_GRACE seconds are
+# never removed, so downstream readers don't lose files mid-read.
+CACHE_ROOT = OUTPUT_ROOT / "cache"
+CACHE_MAX_BYTES = int(os.environ.get("SPLITTER_CACHE_MAX_BYTES", str(20 * 1024 ** 3)))
+CACHE_MAX_AGE = int(os.environ.get("SPLITTER_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+CACHE_GRACE = int(os.environ.get("SPLITTER_CACHE_GRACE", "600"))
+GC_INTERVAL = float(os.environ.get("SPLITTER_GC_INTERVAL", "300"))
+MANIFEST_NAME = "manifest.json"
+
+# Split modes: "memory" decodes the whole upload with pydub; "stream" writes the
+# upload to SPLITTER_WORK_DIR and cuts each chunk with a seeking ffmpeg process,
+# so memory use does not grow with the input duration.
+SPLIT_MODES = {"memory", "stream"}
+DEFAULT_MODE = os.environ.get("SPLITTER_MODE", "memory")
+WORK_DIR = Path(os.environ.get("SPLITTER_WORK_DIR", tempfile.gettempdir())).expanduser()
+UPLOAD_READ_SIZE = 1024 * 1024
+
+# Output profiles: "default" keeps the input's rate and channels; "transcription"
+# resamples once to 16 kHz mono 16-bit (what Whisper decodes to anyway) and writes
+# lossless wav/flac chunks, or with raw_file one headerless s16le file that chunks
+# reference by byte offset, so consumers can np.memmap it without decoding.
+PROFILES = {"default", "transcription"}
+DEFAULT_PROFILE = os.environ.get("SPLITTER_PROFILE", "default")
+TRANSCRIPTION_RATE = 16000
+TRANSCRIPTION_FORMATS = {"wav", "flac"}
+TRANSCRIPTION_ARGS = ["-ac", "1", "-ar", str(TRANSCRIPTION_RATE), "-sample_fmt", "s16"]
+
+# Boundary modes: "fixed" cuts exactly every chunk_ms; "silence" moves each cut to
+# the quietest point within search_ms of the target, found by an RMS scan of the
+# decoded samples around the cut (memory mode) or of a short ffmpeg decode of
+# that window at ANALYSIS_RATE Hz mono (stream mode).
+BOUNDARY_MODES = {"fixed", "silence"}
+DEFAULT_BOUNDARY = os.environ.get("SPLITTER_BOUNDARY", "fixed")
+ANALYSIS_RATE = 8000
+RMS_FRAME_MS = 10
+RMS_WINDOW_MS = 100
+
+# Input codecs that can be stream-copied (no re-encode) into each output container
+COPY_CODECS = {
+    "mp3": {"mp3"},
+    "wav": {"pcm_s16le"},
+    "flac": {"flac"},
+    "ogg": {"vorbis", "opus"},
+    "m4a": {"aac"},
+    "mp4": {"aac"},
+    "aac": {"aac"},
+    "webm": {"opus", "vorbis"},
+}
+# Encoder settings when the codec has to change; mp3 matches the pydub export bitrate
+ENCODE_ARGS = {
+    "mp3": ["-c:a", "libmp3lame", "-b:a", "192k"],
+    "wav": ["-c:a", "pcm_s16le"],
+    "flac": ["-c:a", "flac"],
+    "ogg": ["-c:a", "libvorbis"],
+    "m4a": ["-c:a", "aac"],
+    "mp4": ["-c:a", "aac"],
+    "aac": ["-c:a", "aac"],
+    "webm": ["-c:a", "libopus"],
+}
+
 
 def _slugify(stem: str) -> str:
     cleaned = SAFE_FILENAME_RE.sub("_", stem).strip("._")
     return cleaned or "audio"
 
 
-def allocate_output_directory(original_filename: str) -> tuple[Path, Path, str]:
-    """Create a unique directory for the request and return (absolute, relative, stem)."""
+def output_key(content_digest: str, params: dict) -> str:
+    """Cache key of a split: the upload's sha256 plus the parameters that shape the output."""
+    encoded = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{content_digest}:{encoded}".encode()).hexdigest()
+
+
+def allocate_output_directory(original_filename: str, key: str) -> tuple[Path, Path, str]:
+    """Create the (empty) directory of a cache entry and return (absolute, relative, stem)."""
     stem = _slugify(Path(original_filename).stem or "audio")
-    now = datetime.utcnow()
-    relative_dir = Path(now.strftime("%Y/%m/%d")) / f"{stem}_{now.strftime('%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    relative_dir = CACHE_ROOT.relative_to(OUTPUT_ROOT) / key[:2] / key
     target_dir = OUTPUT_ROOT / relative_dir
-    target_dir.mkdir(parents=True, exist_ok=True)
+    # Left over from a split that died before writing its manifest
+    shutil.rmtree(target_dir, ignore_errors=True)
+    target_dir.mkdir(parents=True)
     return target_dir, relative_dir, stem
 
 
-def export_segment_to_bytes(segment: AudioSegment, fmt: str) -> bytes:
-    buf = io.BytesIO()
+def directory_size(path: Path) -> int:
+    return sum(entry.stat().st_size for entry in path.iterdir() if entry.is_file())
+
+
+class OutputCache:
+    """Index of cache entries (key -> [size, last used]) with LRU/age-based retention."""
+
+    def __init__(self, root: Path, max_bytes: int, max_age: float, grace: float):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.grace = grace
+        self.entries: dict[str, list] = {}
+        # key -> [lock, holders]; a key is claimed while a request looks it up or builds it
+        self.claims: dict[str, list] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evicted_entries = 0
+        self.evicted_bytes = 0
+        self.last_collection: Optional[float] = None
+
+    def entry_dir(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def scan(self):
+        """Rebuild the index from disk at startup and drop unfinished or half-deleted entries."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        for shard in self.root.iterdir():
+            if shard.name.startswith(".trash-"):
+                shutil.rmtree(shard, ignore_errors=True)
+                continue
+            if not shard.is_dir():
+                continue
+            for directory in shard.iterdir():
+                manifest = directory / MANIFEST_NAME
+                if manifest.is_file():
+                    self.entries[directory.name] = [directory_size(directory), manifest.stat().st_mtime]
+                else:
+                    shutil.rmtree(directory, ignore_errors=True)
+        logger.info("Output cache: %d entries, %d bytes", len(self.entries), self.total_bytes())
+
+    def total_bytes(self) -> int:
+        return sum(size for size, _ in self.entries.values())
+
+    @asynccontextmanager
+    async def claim(self, key: str):
+        """Serialize requests for the same key, so a repeat waits for the first and then hits."""
+        slot = self.claims.setdefault(key, [asyncio.Lock(), 0])
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                yield
+        finally:
+            slot[1] -= 1
+            if not slot[1]:
+                del self.claims[key]
+
+    def lookup(self, key: str) -> Optional[dict]:
+        """Stored manifest of key, marking it as used; None on a miss."""
+        manifest_path = self.entry_dir(key) / MANIFEST_NAME
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.entries.pop(key, None)
+            self.misses += 1
+            return None
+        now = time.time()
+        # The manifest's mtime records the last use, so LRU order survives restarts
+        os.utime(manifest_path, (now, now))
+        if key in self.entries:
+            self.entries[key][1] = now
+        else:
+            self.entries[key] = [directory_size(manifest_path.parent), now]
+        self.hits += 1
+        return manifest
+
+    def store(self, key: str, manifest: dict):
+        directory = self.entry_dir(key)
+        # Written last: an entry without a manifest is incomplete
+        partial = directory / f"{MANIFEST_NAME}.partial"
+        partial.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+        partial.replace(directory / MANIFEST_NAME)
+        self.entries[key] = [directory_size(directory), time.time()]
+
+    def select_victims(self, now: float) -> List[str]:
+        """Keys to evict: idle longer than max_age, then least recently used while over max_bytes."""
+        candidates = sorted(
+            (last_used, key) for key, (_, last_used) in self.entries.items()
+            if key not in self.claims and now - last_used > self.grace
+        )
+        victims = [key for last_used, key in candidates if self.max_age and now - last_used > self.max_age]
+        excess = self.total_bytes() - sum(self.entries[key][0] for key in victims) - self.max_bytes
+        for _, key in candidates[len(victims):]:
+            if not self.max_bytes or excess <= 0:
+                break
+            victims.append(key)
+            excess -= self.entries[key][0]
+        if self.max_bytes and excess > 0:
+            logger.warning("Output cache is %d bytes over its limit; the rest was used recently", excess)
+        return victims
+
+    async def collect(self) -> int:
+        """Evict entries; returns the number removed."""
+        victims = self.select_victims(time.time())
+        trash = []
+        for key in victims:
+            size, _ = self.entries.pop(key)
+            # Renamed on the event loop, so no lookup can return an entry that is being deleted
+            target = self.root / f".trash-{uuid.uuid4().hex}"
+            try:
+                self.entry_dir(key).rename(target)
+            except OSError as exc:
+                logger.warning("Could not evict %s: %s", key, exc)
+                continue
+            trash.append(target)
+            try:
+                self.entry_dir(key).parent.rmdir()
+            except OSError:
+                pass  # shard still holds other entries
+            self.evicted_entries += 1
+            self.evicted_bytes += size
+        for target in trash:
+            await asyncio.to_thread(shutil.rmtree, target, True)
+        self.last_collection = time.time()
+        if trash:
+            logger.info("Output cache: evicted %d entries, %d bytes left", len(trash), self.total_bytes())
+        return len(trash)
+
+    async def run_collector(self):
+        while True:
+            try:
+                await self.collect()
+            except Exception:
+                logger.exception("Output cache collection failed")
+            await asyncio.sleep(GC_INTERVAL)
+
+    def stats(self) -> dict:
+        usage = shutil.disk_usage(OUTPUT_ROOT)
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes(),
+            "max_bytes": self.max_bytes,
+            "max_age_seconds": self.max_age,
+            "grace_seconds": self.grace,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted_entries": self.evicted_entries,
+            "evicted_bytes": self.evicted_bytes,
+            "in_progress": len(self.claims),
+            "last_collection": self.last_collection,
+            "volume": {"total_bytes": usage.total, "used_bytes": usage.used, "free_bytes": usage.free},
+        }
+
+
+output_cache = OutputCache(CACHE_ROOT, CACHE_MAX_BYTES, CACHE_MAX_AGE, CACHE_GRACE)
+
+
+async def cached_split(key: str, filename: str,
+                       produce: Callable[[Path, Path, str], Awaitable[dict]]) -> dict:
+    """Return the stored result of key, or run produce(request_dir, relative_dir, stem) and store it."""
+    async with output_cache.claim(key):
+        manifest = output_cache.lookup(key)
+        if manifest is not None:
+            logger.info("Serving %s from cache entry %s", filename, key)
+            return {**manifest, "filename": filename, "key": key, "cached": True}
+        request_dir, relative_dir, stem = allocate_output_directory(filename, key)
+        try:
+            manifest = await produce(request_dir, relative_dir, stem)
+            output_cache.store(key, manifest)
+        except BaseException:
+            shutil.rmtree(request_dir, ignore_errors=True)
+            raise
+    return {**manifest, "key": key, "cached": False}
+
+
+def encode_chunk_to_file(data: bytes, sample_width: int, frame_rate: int, channels: int,
+                         fmt: str, path: str) -> int:
+    """Encode raw PCM into fmt at path; runs in a worker process. Returns the file size."""
+    segment = AudioSegment(data=data, sample_width=sample_width, frame_rate=frame_rate, channels=channels)
     params = {}
     # Favor safe defaults
     if fmt == "mp3":
         params = {"bitrate": "192k"}
+    segment.export(path, format=fmt, **params)
+    return os.path.getsize(path)
+
+
+def get_encode_pool() -> ProcessPoolExecutor:
+    global encode_pool
+    if encode_pool is None:
+        # spawn: forking a process that already runs the event loop and threads is unsafe
+        encode_pool = ProcessPoolExecutor(max_workers=ENCODE_WORKERS, mp_context=get_context("spawn"))
+    return encode_pool
+
+
+async def encode_chunks(audio: AudioSegment, windows: List[tuple[int, int]], output_format: str,
+                        request_dir: Path, stem: str, pool: ProcessPoolExecutor,
+                        max_in_flight: int = MAX_CHUNKS_IN_FLIGHT) -> List[tuple[str, int]]:
+    """Encode every window to its own file in the pool; returns (filename, size) in window order."""
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(max_in_flight)
+
+    async def encode(index: int, start: int, end: int) -> tuple[str, int]:
+        async with slots:
+            segment = audio[start:end]
+            chunk_name = f"{stem}_chunk_{index:03d}.{output_format}"
+            size = await loop.run_in_executor(
+                pool, encode_chunk_to_file, segment.raw_data, segment.sample_width, segment.frame_rate,
+                segment.channels, output_format, str(request_dir / chunk_name),
+            )
+            return chunk_name, size
+
+    return await asyncio.gather(*(encode(index, start, end) for index, (start, end) in enumerate(windows)))
+
+
+def plan_chunks(duration_ms: int, chunk_ms: int, overlap_ms: int) -> List[tuple[int, int]]:
+    """Sliding (start_ms, end_ms) windows with the configured overlap."""
+    windows = []
+    start = 0
+    while start < duration_ms:
+        end = min(start + chunk_ms, duration_ms)
+        windows.append((start, end))
+        if end >= duration_ms:
+            break
+        # Следующий фрагмент начинается с учетом пересечения
+        start = end - overlap_ms
+    return windows
+
+
+def quietest_point(samples: np.ndarray, sample_rate: int,
+                   target_ms: Optional[int] = None) -> Optional[tuple[int, float]]:
+    """
+    Offset (ms) and level (dBFS) of the quietest RMS_WINDOW_MS stretch of samples in [-1, 1].
+
+    Energy is computed per RMS_FRAME_MS frame in one vectorized pass and smoothed
+    over RMS_WINDOW_MS, so a short dip inside a word does not win over a real pause.
+    Among near-silent candidates the one closest to target_ms (an offset into the
+    span, default its middle) wins.
+    """
+    frame = max(sample_rate * RMS_FRAME_MS // 1000, 1)
+    count = len(samples) // frame
+    if count == 0:
+        return None
+    frames = samples[:count * frame].astype(np.float32).reshape(count, frame)
+    energy = np.mean(frames * frames, axis=1)
+    width = min(max(RMS_WINDOW_MS // RMS_FRAME_MS, 1), count)
+    rms = np.sqrt(np.convolve(energy, np.ones(width) / width, mode="valid"))
+    candidates = np.flatnonzero(rms <= rms.min() * 1.1 + 1e-6)
+    # Candidate i is reported at the middle of its smoothing window
+    target = (len(rms) - 1) / 2 if target_ms is None else target_ms / RMS_FRAME_MS - width / 2
+    best = candidates[np.argmin(np.abs(candidates - target))]
+    offset_ms = int((best + width / 2) * RMS_FRAME_MS)
+    return offset_ms, round(20 * math.log10(max(float(rms[best]), 1e-10)), 1)
+
+
+def segment_samples(segment: AudioSegment) -> np.ndarray:
+    """Mono float samples in [-1, 1] of a decoded pydub segment."""
+    dtype = {1: np.int8, 2: np.int16, 4: np.int32}[segment.sample_width]
+    samples = np.frombuffer(segment.raw_data, dtype=dtype).reshape(-1, segment.channels).mean(axis=1)
+    return samples / float(2 ** (8 * segment.sample_width - 1))
+
+
+async def plan_silence_chunks(duration_ms: int, chunk_ms: int, overlap_ms: int, search_ms: int,
+                              load_samples: Callable[[int, int], Awaitable[tuple[np.ndarray, int]]]
+                              ) -> tuple[List[tuple[int, int]], List[dict]]:
+    """
+    Windows whose ends sit at the quietest point near every chunk_ms target.
+
+    load_samples(start_ms, end_ms) returns (mono samples, sample rate) of a span.
+    Returns the windows and, per cut, the target, the chosen cut and its level.
+    """
+    windows = []
+    cut_points = []
+    start = 0
+    previous_cut = 0
+    while True:
+        target = previous_cut + chunk_ms
+        if target >= duration_ms:
+            windows.append((start, duration_ms))
+            return windows, cut_points
+        # Every cut moves forward past the overlap, so chunks never shrink to nothing
+        low = max(target - search_ms, previous_cut + overlap_ms + 1)
+        high = min(target + search_ms, duration_ms)
+        samples, sample_rate = await load_samples(low, high)
+        # The span may be clipped on either side, so its middle is not always the target
+        quiet = quietest_point(samples, sample_rate, target - low)
+        cut, level = (min(low + quiet[0], high), quiet[1]) if quiet else (target, None)
+        if cut >= duration_ms:
+            windows.append((start, duration_ms))
+            return windows, cut_points
+        windows.append((start, cut))
+        cut_points.append({"target_ms": target, "cut_ms": cut, "rms_dbfs": level})
+        previous_cut = cut
+        start = cut - overlap_ms
+
+
+async def save_upload(file: UploadFile, path: Path, digest=None) -> int:
+    """Stream the upload to disk in fixed-size reads, feeding digest if given; returns the bytes written."""
+    size = 0
+    with path.open("wb") as fh:
+        while True:
+            block = await file.read(UPLOAD_READ_SIZE)
+            if not block:
+                break
+            fh.write(block)
+            if digest is not None:
+                digest.update(block)
+            size += len(block)
+    return size
+
+
+async def run_command(args: List[str]) -> bytes:
+    """Run ffmpeg/ffprobe without blocking the event loop; returns stdout."""
+    process = await asyncio.create_subprocess_exec(
+        *args, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"{args[0]} failed: {stderr.decode(errors='replace').strip()[-500:]}")
+    return stdout
+
+
+async def probe_audio(path: Path) -> tuple[int, Optional[str]]:
+    """Duration in ms and codec name of the first audio stream, read by ffprobe."""
+    output = await run_command([
+        "ffprobe", "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "stream=codec_name:format=duration", "-of", "json", str(path),
+    ])
+    info = json.loads(output)
+    streams = info.get("streams") or []
+    duration = info.get("format", {}).get("duration")
+    if not streams or duration is None:
+        raise HTTPException(status_code=400, detail="No audio stream found")
+    return int(round(float(duration) * 1000)), streams[0].get("codec_name")
+
+
+async def load_span_samples(path: Path, start_ms: int, end_ms: int) -> tuple[np.ndarray, int]:
+    """Decode only [start_ms, end_ms) to mono ANALYSIS_RATE Hz samples in [-1, 1]."""
+    output = await run_command([
+        "ffmpeg", "-nostdin", "-v", "error",
+        "-ss", f"{start_ms / 1000:.3f}", "-i", str(path), "-t", f"{(end_ms - start_ms) / 1000:.3f}",
+        "-map", "0:a:0", "-ac", "1", "-ar", str(ANALYSIS_RATE), "-f", "s16le", "-",
+    ])
+    return np.frombuffer(output, dtype=np.int16) / 32768.0, ANALYSIS_RATE
+
+
+async def cut_chunk(source: Path, target: Path, start_ms: int, end_ms: int, output_format: str, copy: bool,
+                    profile: str = "default"):
+    """Cut [start_ms, end_ms) with input seeking; stream copy or re-encode."""
+    codec_args = ["-c:a", "copy"] if copy else ENCODE_ARGS[output_format]
+    if profile == "transcription":
+        codec_args = TRANSCRIPTION_ARGS + codec_args
+    await run_command([
+        "ffmpeg", "-nostdin", "-v", "error", "-y",
+        "-ss", f"{start_ms / 1000:.3f}", "-i", str(source), "-t", f"{(end_ms - start_ms) / 1000:.3f}",
+        "-map", "0:a:0", "-vn", *codec_args, str(target),
+    ])
+
+
+async def decode_to_raw(source: Path, target: Path):
+    """Decode the whole input once into headerless 16 kHz mono s16le samples."""
+    await run_command([
+        "ffmpeg", "-nostdin", "-v", "error", "-y", "-i", str(source),
+        "-map", "0:a:0", "-vn", *TRANSCRIPTION_ARGS, "-f", "s16le", str(target),
+    ])
+
+
+def to_transcription_audio(audio: AudioSegment) -> AudioSegment:
+    return audio.set_channels(1).set_frame_rate(TRANSCRIPTION_RATE).set_sample_width(2)
+
+
+def memmap_sample_loader(path: Path) -> Callable[[int, int], Awaitable[tuple[np.ndarray, int]]]:
+    """Silence analysis straight from the raw file instead of decoding windows again."""
+    samples = np.memmap(path, dtype="<i2", mode="r")
+
+    async def load(start_ms: int, end_ms: int) -> tuple[np.ndarray, int]:
+        span = samples[start_ms * TRANSCRIPTION_RATE // 1000:end_ms * TRANSCRIPTION_RATE // 1000]
+        return span / 32768.0, TRANSCRIPTION_RATE
+
+    return load
+
+
+def chunk_entry(index: int, start: int, end: int, output_format: str, relative_dir: Path,
+                chunk_name: str, size_bytes: int) -> dict:
+    relative_chunk = relative_dir / chunk_name
+    return {
+        "index": index,
+        "start_ms": start,
+        "end_ms": end,
+        "format": output_format,
+        "path": (PUBLIC_ROOT / relative_chunk).as_posix(),
+        "filename": chunk_name,
+        "size_bytes": size_bytes,
+    }
+
+
+def raw_chunk_entry(index: int, start: int, end: int, relative_dir: Path, raw_name: str,
+                    total_samples: int) -> dict:
+    """Chunk as a sample range of the raw file: bytes [offset_bytes, offset_bytes + size_bytes)."""
+    first = min(start * TRANSCRIPTION_RATE // 1000, total_samples)
+    last = min(end * TRANSCRIPTION_RATE // 1000, total_samples)
+    entry = chunk_entry(index, start, end, "s16le", relative_dir, raw_name, (last - first) * 2)
+    entry.update(offset_bytes=first * 2, num_samples=last - first)
+    return entry
+
+
+def profile_fields(profile: str, relative_dir: Path, raw_name: Optional[str]) -> dict:
+    if profile != "transcription":
+        return {"profile": profile}
+    fields = {"profile": profile, "sample_rate": TRANSCRIPTION_RATE, "channels": 1}
+    if raw_name is not None:
+        fields["raw_file"] = (PUBLIC_ROOT / relative_dir / raw_name).as_posix()
+    return fields
+
+
+async def split_streaming(file: UploadFile, filename: str, chunk_ms: int, overlap_ms: int,
+                          output_format: str, boundary: str, search_ms: int, profile: str,
+                          raw_file: bool, params: dict) -> dict:
+    """Split without decoding the whole file: upload to disk, then one ffmpeg cut per chunk."""
+    WORK_DIR.mkdir(parents=True, exist_ok=True)
+    upload_path = WORK_DIR / f"upload_{uuid.uuid4().hex}"
     try:
-        segment.export(buf, format=fmt, **params)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Export failed: {e}")
-    return buf.getvalue()
+        digest = hashlib.sha256()
+        if not await save_upload(file, upload_path, digest):
+            raise HTTPException(status_code=400, detail="Empty file")
+
+        async def produce(request_dir: Path, relative_dir: Path, stem: str) -> dict:
+            duration_ms, codec = await probe_audio(upload_path)
+            copy = profile == "default" and codec in COPY_CODECS[output_format]
+            logger.info("Writing %s chunks to %s (stream copy: %s)", filename, request_dir, copy)
+
+            raw_name = None
+            load_samples = lambda start, end: load_span_samples(upload_path, start, end)  # noqa: E731
+            if raw_file:
+                raw_name = f"{stem}.s16le"
+                await decode_to_raw(upload_path, request_dir / raw_name)
+                total_samples = (request_dir / raw_name).stat().st_size // 2
+                if not total_samples:
+                    raise HTTPException(status_code=400, detail="No audio decoded")
+                duration_ms = total_samples * 1000 // TRANSCRIPTION_RATE
+                load_samples = memmap_sample_loader(request_dir / raw_name)
+
+            if boundary == "silence":
+                windows, cut_points = await plan_silence_chunks(
+                    duration_ms, chunk_ms, overlap_ms, search_ms, load_samples
+                )
+            else:
+                windows, cut_points = plan_chunks(duration_ms, chunk_ms, overlap_ms), None
+
+            if raw_name is not None:
+                chunks = [
+                    raw_chunk_entry(index, start, end, relative_dir, raw_name, total_samples)
+                    for index, (start, end) in enumerate(windows)
+                ]
+            else:
+                slots = asyncio.Semaphore(ENCODE_WORKERS)
+
+                async def cut(index: int, start: int, end: int) -> dict:
+                    chunk_name = f"{stem}_chunk_{index:03d}.{output_format}"
+                    chunk_path = request_dir / chunk_name
+                    async with slots:
+                        try:
+                            await cut_chunk(upload_path, chunk_path, start, end, output_format, copy, profile)
+                        except RuntimeError as exc:
+                            logger.error("Failed writing chunk %s: %s", chunk_path, exc)
+                            raise HTTPException(status_code=500, detail=f"Failed to write chunk: {exc}")
+                    return chunk_entry(index, start, end, output_format, relative_dir, chunk_name,
+                                       chunk_path.stat().st_size)
+
+                chunks = await asyncio.gather(*(cut(index, start, end) for index, (start, end) in enumerate(windows)))
+
+            return {
+                "filename": filename,
+                "duration_ms": duration_ms,
+                "chunk_ms": chunk_ms,
+                "overlap_ms": overlap_ms,
+                "mode": "stream",
+                "stream_copy": copy,
+                **profile_fields(profile, relative_dir, raw_name),
+                "boundary": boundary,
+                **({"cut_points": cut_points} if cut_points is not None else {}),
+                "count": len(chunks),
+                "output_directory": (PUBLIC_ROOT / relative_dir).as_posix(),
+                "chunks": chunks,
+            }
+
+        return await cached_split(output_key(digest.hexdigest(), params), filename, produce)
+    finally:
+        upload_path.unlink(missing_ok=True)
 
 
 @app.get("/health")
@@ -76,12 +656,25 @@ async def health():
     return {"status": "healthy", "service": "splitter"}
 
 
+@app.get("/stats")
+async def stats():
+    """Output cache usage, hit/miss and eviction counters, and free space on the output volume."""
+    return output_cache.stats()
+
+
 @app.post("/split")
 async def split_audio(
     file: UploadFile = File(..., description="Audio file to split"),
     chunk_ms: int = Form(360_000, description="Chunk size in milliseconds (default 6 minutes)"),
     overlap_ms: int = Form(5_000, description="Overlap between chunks in milliseconds"),
-    output_format: str = Form("mp3", description="Output format for chunks: mp3|wav|ogg|flac|m4a"),
+    output_format: Optional[str] = Form(
+        None, description="Output format for chunks: mp3|wav|ogg|flac|m4a (default mp3, flac for transcription)"
+    ),
+    mode: str = Form(DEFAULT_MODE, description="memory (decode with pydub) or stream (disk + ffmpeg seeking)"),
+    boundary: str = Form(DEFAULT_BOUNDARY, description="fixed (cut every chunk_ms) or silence (quietest nearby point)"),
+    search_ms: int = Form(5_000, description="silence boundary: how far a cut may move from its target, in ms"),
+    profile: str = Form(DEFAULT_PROFILE, description="default or transcription (16 kHz mono wav/flac)"),
+    raw_file: bool = Form(False, description="transcription profile: one raw s16le file with per-chunk offsets"),
 ):
     # Validate
     if chunk_ms <= 0:
@@ -96,67 +689,106 @@ async def split_audio(
     if ext and ext not in SUPPORTED_EXT:
         raise HTTPException(status_code=400, detail=f"Unsupported file extension: {ext}")
 
-    output_format = output_format.strip().lower()
+    profile = profile.strip().lower()
+    if profile not in PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unsupported profile: {profile}")
+    output_format = (output_format or ("flac" if profile == "transcription" else "mp3")).strip().lower()
     if output_format not in SUPPORTED_EXT:
         raise HTTPException(status_code=400, detail=f"Unsupported output format: {output_format}")
+    if profile == "transcription" and output_format not in TRANSCRIPTION_FORMATS:
+        raise HTTPException(status_code=400, detail="The transcription profile writes wav or flac")
+    if raw_file and profile != "transcription":
+        raise HTTPException(status_code=400, detail="raw_file requires the transcription profile")
+
+    mode = mode.strip().lower()
+    if mode not in SPLIT_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported mode: {mode}")
+    boundary = boundary.strip().lower()
+    if boundary not in BOUNDARY_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported boundary: {boundary}")
+    if boundary == "silence" and not 0 <= search_ms < chunk_ms:
+        raise HTTPException(status_code=400, detail="search_ms must be >= 0 and smaller than chunk_ms")
+
+    # Everything that changes the output; the upload's hash completes the cache key
+    params = {
+        "chunk_ms": chunk_ms,
+        "overlap_ms": overlap_ms,
+        "output_format": output_format,
+        "mode": mode,
+        "profile": profile,
+        "raw_file": raw_file,
+        "boundary": boundary,
+        "search_ms": search_ms if boundary == "silence" else None,
+    }
 
     try:
+        if mode == "stream":
+            return await split_streaming(file, filename, chunk_ms, overlap_ms, output_format, boundary, search_ms,
+                                         profile, raw_file, params)
+
         # Read into memory
         data = await file.read()
         if not data:
             raise HTTPException(status_code=400, detail="Empty file")
+        key = output_key(hashlib.sha256(data).hexdigest(), params)
 
-        # Let pydub/ffmpeg detect format from bytes
-        audio = AudioSegment.from_file(io.BytesIO(data))
-        duration_ms = len(audio)
+        async def produce(request_dir: Path, relative_dir: Path, stem: str) -> dict:
+            nonlocal data
+            # Let pydub/ffmpeg detect format from bytes; decode off the event loop
+            audio = await asyncio.to_thread(AudioSegment.from_file, io.BytesIO(data))
+            # The compressed upload is not needed once decoded
+            data = None
+            if profile == "transcription":
+                # Resample once here instead of in every consumer of every chunk
+                audio = await asyncio.to_thread(to_transcription_audio, audio)
+            duration_ms = len(audio)
+            logger.info("Writing %s chunks to %s", filename, request_dir)
 
-        request_dir, relative_dir, stem = allocate_output_directory(filename)
-        logger.info("Writing %s chunks to %s", filename, request_dir)
+            # Sliding window with configurable overlap; chunks are encoded in parallel
+            if boundary == "silence":
+                async def load_samples(start: int, end: int) -> tuple[np.ndarray, int]:
+                    return segment_samples(audio[start:end]), audio.frame_rate
 
-        chunks: List[dict] = []
-        start = 0
-        index = 0
-        # Sliding window with configurable overlap
-        while start < duration_ms:
-            end = min(start + chunk_ms, duration_ms)
-            segment = audio[start:end]
-            raw = export_segment_to_bytes(segment, output_format)
-            chunk_name = f"{stem}_chunk_{index:03d}.{output_format}"
-            chunk_path = request_dir / chunk_name
-            try:
-                with chunk_path.open("wb") as fh:
-                    fh.write(raw)
-            except Exception as exc:
-                logger.exception("Failed writing chunk %s", chunk_path)
-                raise HTTPException(status_code=500, detail=f"Failed to write chunk: {exc}")
-
-            relative_chunk = relative_dir / chunk_name
-            public_path = (PUBLIC_ROOT / relative_chunk).as_posix()
-
-            chunks.append({
-                "index": index,
-                "start_ms": start,
-                "end_ms": end,
-                "format": output_format,
-                "path": public_path,
-                "filename": chunk_name,
-                "size_bytes": len(raw),
-            })
-            index += 1
-            if end >= duration_ms:
-                break
-            # Следующий фрагмент начинается с учетом пересечения
-            start = end - overlap_ms
+                windows, cut_points = await plan_silence_chunks(
+                    duration_ms, chunk_ms, overlap_ms, search_ms, load_samples
+                )
+            else:
+                windows, cut_points = plan_chunks(duration_ms, chunk_ms, overlap_ms), None
+            raw_name = None
+            if raw_file:
+                raw_name = f"{stem}.s16le"
+                await asyncio.to_thread((request_dir / raw_name).write_bytes, audio.raw_data)
+                total_samples = len(audio.raw_data) // 2
+                chunks = [
+                    raw_chunk_entry(index, start, end, relative_dir, raw_name, total_samples)
+                    for index, (start, end) in enumerate(windows)
+                ]
+            else:
+                try:
+                    encoded = await encode_chunks(audio, windows, output_format, request_dir, stem, get_encode_pool())
+                except Exception as exc:
+                    logger.exception("Failed encoding chunks to %s", request_dir)
+                    raise HTTPException(status_code=500, detail=f"Failed to write chunk: {exc}")
+                chunks = [
+                    chunk_entry(index, start, end, output_format, relative_dir, chunk_name, size)
+                    for index, ((start, end), (chunk_name, size)) in enumerate(zip(windows, encoded))
+                ]
 
-        return {
-            "filename": filename,
-            "duration_ms": duration_ms,
-            "chunk_ms": chunk_ms,
-            "overlap_ms": overlap_ms,
-            "count": len(chunks),
-            "output_directory": (PUBLIC_ROOT / relative_dir).as_posix(),
-            "chunks": chunks,
-        }
+            return {
+                "filename": filename,
+                "duration_ms": duration_ms,
+                "chunk_ms": chunk_ms,
+                "overlap_ms": overlap_ms,
+                "mode": "memory",
+                **profile_fields(profile, relative_dir, raw_name),
+                "boundary": boundary,
+                **({"cut_points": cut_points} if cut_points is not None else {}),
+                "count": len(chunks),
+                "output_directory": (PUBLIC_ROOT / relative_dir).as_posix(),
+                "chunks": chunks,
+            }
+
+        return await cached_split(key, filename, produce)
     except HTTPException:
         raise
     except Exception as e:
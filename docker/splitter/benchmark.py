@@ -0,0 +1,85 @@
+"""
+Benchmark: chunk encoding throughput against the number of worker processes
+
+Encodes the same audio into chunks with app.encode_chunks (the code path of
+the memory split mode) using process pools of increasing size, and reports
+chunks/second, speedup over a single worker and parallel efficiency.
+
+The input is an audio file, or a synthetic signal (sine tones over noise)
+of --minutes length when no file is given.
+
+Usage:
+    python benchmark.py --minutes 60 --chunk-ms 60000 --format mp3 --workers 1 2 4 8
+    python benchmark.py podcast.mp3 --chunk-ms 360000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+from pydub import AudioSegment
+from pydub.generators import Sine, WhiteNoise
+
+import app
+
+
+def synthetic_audio(minutes):
+    """Alternating tones over low noise, 44.1 kHz stereo like a typical podcast export"""
+    minute = Sine(220).to_audio_segment(duration=30_000) + Sine(440).to_audio_segment(duration=30_000)
+    minute = minute.overlay(WhiteNoise().to_audio_segment(duration=60_000, volume=-30))
+    minute = minute.set_frame_rate(44_100).set_channels(2)
+    return minute * int(minutes)
+
+
+def worker_counts(requested):
+    if requested:
+        return requested
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    if counts[-1] != os.cpu_count():
+        counts.append(os.cpu_count())
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", type=Path, help="Audio file (default: synthetic audio)")
+    parser.add_argument("--minutes", type=float, default=30, help="Length of the synthetic audio")
+    parser.add_argument("--chunk-ms", type=int, default=60_000, help="Chunk length in ms")
+    parser.add_argument("--overlap-ms", type=int, default=5_000, help="Overlap between chunks in ms")
+    parser.add_argument("--format", default="mp3", choices=sorted(app.ENCODE_ARGS), help="Output format")
+    parser.add_argument("--workers", nargs="*", type=int, default=None,
+                        help="Pool sizes to benchmark (default: 1, 2, 4, ... up to the core count)")
+    args = parser.parse_args()
+
+    audio = AudioSegment.from_file(args.input) if args.input else synthetic_audio(args.minutes)
+    windows = app.plan_chunks(len(audio), args.chunk_ms, args.overlap_ms)
+    print(f"{len(audio) / 60_000:.1f} min of audio, {len(windows)} chunks of {args.chunk_ms} ms, "
+          f"format {args.format}, {os.cpu_count()} cores")
+
+    baseline = None
+    for workers in worker_counts(args.workers):
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool, \
+                tempfile.TemporaryDirectory() as output:
+            # Start every worker process before timing
+            list(pool.map(abs, range(workers)))
+            started = time.perf_counter()
+            asyncio.run(app.encode_chunks(
+                audio, windows, args.format, Path(output), "bench", pool, max_in_flight=workers * 2
+            ))
+            elapsed = time.perf_counter() - started
+
+        rate = len(windows) / elapsed
+        baseline = baseline or rate
+        speedup = rate / baseline
+        print(f"workers {workers:3d}  {elapsed:8.2f}s  {rate:7.2f} chunks/s  "
+              f"speedup {speedup:5.2f}x  efficiency {speedup / workers:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: end-to-end split + transcribe time per output profile
+
+Splits the same audio with the code path of the memory split mode
+(app.encode_chunks in a process pool) and transcribes every chunk with
+faster-whisper, the way the whisper service consumes them:
+
+- mp3: default profile, 44.1 kHz stereo mp3 chunks; every chunk is decoded
+  and resampled to 16 kHz mono again before transcription
+- wav / flac: transcription profile, resampled once to 16 kHz mono before
+  splitting; chunks only need decoding (and no resampling) in Whisper
+- raw: transcription profile with raw_file, one s16le file; chunks are
+  np.memmap slices at the manifest offsets handed to model.transcribe as
+  float32 arrays, with no decoding at all
+
+and reports split time, transcription time (including chunk decoding),
+total time, its speedup over the first profile (mp3 by default) and the
+output size. Transcription time is dominated by the model, so use a small
+model to see the audio handling difference.
+
+Requires faster-whisper (pip install faster-whisper); models are
+downloaded on first use.
+
+Usage:
+    python benchmark_transcribe.py podcast.mp3 --model tiny --chunk-ms 360000
+    python benchmark_transcribe.py --minutes 20 --profiles mp3 flac raw
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+from faster_whisper import WhisperModel, decode_audio
+from pydub import AudioSegment
+
+import app
+from benchmark import synthetic_audio
+
+PROFILES = ["mp3", "wav", "flac", "raw"]
+
+
+def split(audio, windows, profile, output, pool):
+    """Split like POST /split; returns a list of per-chunk inputs for transcribe()"""
+    if profile != "mp3":
+        audio = app.to_transcription_audio(audio)
+    if profile == "raw":
+        raw_path = output / "bench.s16le"
+        raw_path.write_bytes(audio.raw_data)
+        total_samples = len(audio.raw_data) // 2
+        entries = [
+            app.raw_chunk_entry(index, start, end, Path("."), raw_path.name, total_samples)
+            for index, (start, end) in enumerate(windows)
+        ]
+        return [(raw_path, entry["offset_bytes"], entry["num_samples"]) for entry in entries]
+    encoded = asyncio.run(app.encode_chunks(audio, windows, profile, output, "bench", pool))
+    return [output / chunk_name for chunk_name, _ in encoded]
+
+
+def load_chunk(chunk):
+    if isinstance(chunk, tuple):
+        raw_path, offset_bytes, num_samples = chunk
+        samples = np.memmap(raw_path, dtype="<i2", mode="r", offset=offset_bytes, shape=(num_samples,))
+        return samples.astype(np.float32) / 32768.0
+    return decode_audio(str(chunk), sampling_rate=app.TRANSCRIPTION_RATE)
+
+
+def transcribe(model, chunks, language):
+    words = 0
+    for chunk in chunks:
+        segments, _ = model.transcribe(load_chunk(chunk), language=language, beam_size=1)
+        words += sum(len(segment.text.split()) for segment in segments)
+    return words
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", type=Path, help="Audio file (default: synthetic audio)")
+    parser.add_argument("--minutes", type=float, default=10, help="Length of the synthetic audio")
+    parser.add_argument("--chunk-ms", type=int, default=360_000, help="Chunk length in ms")
+    parser.add_argument("--overlap-ms", type=int, default=5_000, help="Overlap between chunks in ms")
+    parser.add_argument("--profiles", nargs="+", default=PROFILES, choices=PROFILES, help="Paths to benchmark")
+    parser.add_argument("--model", default="tiny", help="faster-whisper model (default: tiny)")
+    parser.add_argument("--compute-type", default="int8", help="CTranslate2 compute type (default: int8)")
+    parser.add_argument("--language", default=None, help="Language code (default: auto-detect)")
+    parser.add_argument("--workers", type=int, default=app.ENCODE_WORKERS, help="Encoding processes")
+    args = parser.parse_args()
+
+    audio = AudioSegment.from_file(args.input) if args.input else synthetic_audio(args.minutes)
+    windows = app.plan_chunks(len(audio), args.chunk_ms, args.overlap_ms)
+    model = WhisperModel(args.model, device="cpu", compute_type=args.compute_type)
+    print(f"{len(audio) / 60_000:.1f} min of audio ({audio.frame_rate} Hz, {audio.channels} ch), "
+          f"{len(windows)} chunks, model {args.model}/{args.compute_type}, {os.cpu_count()} cores")
+
+    baseline = None
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=get_context("spawn")) as pool:
+        list(pool.map(abs, range(args.workers)))
+        for profile in args.profiles:
+            with tempfile.TemporaryDirectory() as output:
+                started = time.perf_counter()
+                chunks = split(audio, windows, profile, Path(output), pool)
+                split_seconds = time.perf_counter() - started
+                size = sum(path.stat().st_size for path in Path(output).iterdir())
+
+                started = time.perf_counter()
+                words = transcribe(model, chunks, args.language)
+                transcribe_seconds = time.perf_counter() - started
+
+            total = split_seconds + transcribe_seconds
+            baseline = baseline or total
+            print(f"{profile:5}  split {split_seconds:7.2f}s  transcribe {transcribe_seconds:8.2f}s  "
+                  f"total {total:8.2f}s  speedup {baseline / total:5.2f}x  "
+                  f"output {size / 2 ** 20:7.1f} MB  words {words}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,21 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from faster_whisper import WhisperModel
+from faster_whisper import BatchedInferencePipeline, WhisperModel, decode_audio
+from concurrent.futures import ProcessPoolExecutor
 import os
+import hashlib
+import json
+import queue
 import tempfile
 import logging
+import multiprocessing
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque, namedtuple
 from pathlib import Path
+from types import SimpleNamespace
 
 # Logging setup
 logging.basicConfig(level=logging.INFO)
@@ -17,46 +28,792 @@ CORS(app)
 TEMP_DIR = '/tmp/whisper'
 os.makedirs(TEMP_DIR, exist_ok=True)
 
-# Global variables to cache model
-current_model = None
-current_model_name = None
+# Model runtime settings: device ("cpu" or "cuda"), CTranslate2 compute type
+# ("int8" reduces memory usage), intra-op threads (0 = library default) and
+# number of workers allowed to run transcriptions on one model concurrently
+MODEL_DEVICE = os.environ.get('WHISPER_DEVICE', 'cpu')
+MODEL_COMPUTE_TYPE = os.environ.get('WHISPER_COMPUTE_TYPE', 'int8')
+MODEL_CPU_THREADS = int(os.environ.get('WHISPER_CPU_THREADS', '0'))
+MODEL_NUM_WORKERS = int(os.environ.get('WHISPER_NUM_WORKERS', '1'))
+
+# Batched inference (faster-whisper BatchedInferencePipeline): default mode and batch size
+BATCHED_DEFAULT = os.environ.get('WHISPER_BATCHED', 'false').strip().lower() == 'true'
+BATCH_SIZE = int(os.environ.get('WHISPER_BATCH_SIZE', '8'))
+
+# Memory budget for loaded models (MB); least recently used models are evicted
+MODEL_POOL_BUDGET_MB = int(os.environ.get('WHISPER_MODEL_POOL_MB', '4096'))
+
+# Approximate resident size of each model (MB), used to account the pool budget
+MODEL_MEMORY_MB = {
+    'tiny': 75,
+    'base': 142,
+    'small': 466,
+    'medium': 1500,
+    'large': 2900,
+}
+
+# Asynchronous job queue: worker threads, max queued jobs, finished job retention
+JOB_WORKERS = int(os.environ.get('WHISPER_JOB_WORKERS', '1'))
+JOB_QUEUE_SIZE = int(os.environ.get('WHISPER_JOB_QUEUE_SIZE', '16'))
+JOB_TTL_SECONDS = int(os.environ.get('WHISPER_JOB_TTL_SECONDS', '3600'))
+
+# Parallel chunked transcription: worker processes and default window/overlap
+PARALLEL_WORKERS = int(os.environ.get('WHISPER_PARALLEL_WORKERS', str(os.cpu_count() or 1)))
+PARALLEL_CHUNK_MS = int(os.environ.get('WHISPER_PARALLEL_CHUNK_MS', '300000'))
+PARALLEL_OVERLAP_MS = int(os.environ.get('WHISPER_PARALLEL_OVERLAP_MS', '5000'))
+
+# Persistent transcription result cache (0 MB disables it)
+RESULT_CACHE_DIR = os.environ.get('WHISPER_RESULT_CACHE_DIR', '/root/.cache/whisper-results')
+RESULT_CACHE_MAX_MB = int(os.environ.get('WHISPER_RESULT_CACHE_MAX_MB', '512'))
+
+# Decoding options shared by every transcription (part of the result cache key)
+TRANSCRIBE_OPTIONS = {
+    'beam_size': 5,
+    'vad_filter': True,  # Voice Activity Detection for better quality
+    'vad_parameters': {'min_silence_duration_ms': 500},
+}
+
+# faster-whisper decodes audio to 16 kHz mono
+SAMPLE_RATE = 16000
+
+# Mounted roots from which /transcribe may read files by path (comma-separated)
+ALLOWED_ROOTS = [
+    os.path.realpath(root.strip())
+    for root in os.environ.get('WHISPER_ALLOWED_ROOTS', '/downloads,/shared').split(',')
+    if root.strip()
+]
 
 # Supported file extensions
 ALLOWED_EXTENSIONS = {'mp3', 'wav', 'm4a', 'ogg', 'flac', 'webm', 'mp4'}
 
+# Streaming output formats for /transcribe and their mimetypes
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream',
+}
+
 def allowed_file(filename):
     """Check allowed file extension"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def get_whisper_model(model_name='base'):
-    """Get or initialize Whisper model"""
-    global current_model, current_model_name
-    
-    if current_model is None or current_model_name != model_name:
+def estimate_model_memory_mb(model_name):
+    """Estimate memory footprint of a model by its size family"""
+    for family in sorted(MODEL_MEMORY_MB, key=len, reverse=True):
+        if family in model_name:
+            return MODEL_MEMORY_MB[family]
+    return MODEL_MEMORY_MB['large']
+
+
+def load_whisper_model(model_name, cpu_threads=None, compute_type=None):
+    """Load a Whisper model from disk (or download it on first use)"""
+    compute_type = compute_type or MODEL_COMPUTE_TYPE
+    logger.info(f"Loading Whisper model: {model_name} ({MODEL_DEVICE}, {compute_type})")
+    model = WhisperModel(
+        model_name,
+        device=MODEL_DEVICE,
+        compute_type=compute_type,
+        cpu_threads=MODEL_CPU_THREADS if cpu_threads is None else cpu_threads,
+        num_workers=MODEL_NUM_WORKERS
+    )
+    logger.info(f"Model {model_name} loaded successfully")
+    return model
+
+
+class _PendingLoad:
+    """Load in progress; concurrent requests for the same model wait on it"""
+
+    def __init__(self, size_mb):
+        self.size_mb = size_mb
+        self.event = threading.Event()
+        self.error = None
+
+
+class ModelPool:
+    """LRU pool of loaded Whisper models bounded by a memory budget"""
+
+    def __init__(self, budget_mb, loader=load_whisper_model):
+        self.budget_mb = budget_mb
+        self._loader = loader
+        self._models = OrderedDict()  # name -> (model, size_mb), LRU first
+        self._loading = {}  # name -> _PendingLoad
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _used_mb(self):
+        loaded = sum(size for _, size in self._models.values())
+        reserved = sum(pending.size_mb for pending in self._loading.values())
+        return loaded + reserved
+
+    def _evict_for(self, size_mb):
+        """Evict least recently used models until size_mb fits (lock held)"""
+        while self._models and self._used_mb() + size_mb > self.budget_mb:
+            name, _ = self._models.popitem(last=False)
+            self.evictions += 1
+            logger.info(f"Evicted Whisper model from pool: {name}")
+
+    def get(self, model_name):
+        """Return a loaded model, loading it at most once across concurrent callers"""
+        while True:
+            with self._lock:
+                entry = self._models.get(model_name)
+                if entry is not None:
+                    self._models.move_to_end(model_name)
+                    self.hits += 1
+                    return entry[0]
+
+                pending = self._loading.get(model_name)
+                if pending is None:
+                    size_mb = estimate_model_memory_mb(model_name)
+                    self.misses += 1
+                    self._evict_for(size_mb)
+                    if size_mb > self.budget_mb:
+                        logger.warning(
+                            f"Model {model_name} (~{size_mb} MB) exceeds pool budget of {self.budget_mb} MB"
+                        )
+                    pending = _PendingLoad(size_mb)
+                    self._loading[model_name] = pending
+                    break
+
+            # Another request is loading this model; wait and re-check the pool
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+
         try:
-            logger.info(f"Loading Whisper model: {model_name}")
-            # device="cpu" for CPU, change to "cuda" for GPU
-            # compute_type="int8" to reduce memory usage
-            current_model = WhisperModel(model_name, device="cpu", compute_type="int8")
-            current_model_name = model_name
-            logger.info(f"Model {model_name} loaded successfully")
+            model = self._loader(model_name)
         except Exception as e:
             logger.error(f"Error loading model: {str(e)}")
+            pending.error = e
+            with self._lock:
+                del self._loading[model_name]
+            pending.event.set()
             raise
-    
-    return current_model
+
+        with self._lock:
+            del self._loading[model_name]
+            self._models[model_name] = (model, pending.size_mb)
+        pending.event.set()
+        return model
+
+    def stats(self):
+        """Pool occupancy and hit/miss/eviction counters"""
+        with self._lock:
+            return {
+                'budget_mb': self.budget_mb,
+                'used_mb': sum(size for _, size in self._models.values()),
+                'loaded_models': list(self._models.keys()),
+                'loading_models': list(self._loading.keys()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+model_pool = ModelPool(MODEL_POOL_BUDGET_MB)
+
+
+def get_whisper_model(model_name='base'):
+    """Get or initialize Whisper model"""
+    return model_pool.get(model_name)
+
+class ResultCache:
+    """Size-bounded on-disk cache of transcription results with LRU eviction"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> size in bytes, LRU first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.enabled:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._load_index()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def _load_index(self):
+        """Rebuild the LRU order from file modification times"""
+        files = sorted(self.directory.glob('*.json'), key=lambda path: path.stat().st_mtime)
+        for path in files:
+            self._entries[path.stem] = path.stat().st_size
+        self._evict()
+        logger.info(f"Result cache: {len(self._entries)} entries in {self.directory}")
+
+    def _evict(self):
+        """Drop least recently used entries beyond the size limit (lock held)"""
+        total = sum(self._entries.values())
+        while self._entries and total > self.max_bytes:
+            key, size = self._entries.popitem(last=False)
+            total -= size
+            self.evictions += 1
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with path.open('r', encoding='utf-8') as fh:
+                    result = json.load(fh)
+                os.utime(path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Dropping unreadable cache entry {key}: {str(e)}")
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        if not self.enabled:
+            return
+        data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        path = self._path(key)
+        tmp_path = path.with_suffix('.tmp')
+        with self._lock:
+            try:
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Failed to write cache entry {key}: {str(e)}")
+                return
+            self._entries[key] = len(data)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                try:
+                    self._path(key).unlink()
+                except FileNotFoundError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                try:
+                    self._path(key).unlink()
+                except FileNotFoundError:
+                    pass
+            removed = len(self._entries)
+            self._entries.clear()
+            return removed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'size_bytes': sum(self._entries.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+result_cache = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_MB * 1024 * 1024)
+
+
+def audio_content_hash(stream):
+    """SHA-256 of an upload stream, read in blocks; the stream is rewound afterwards"""
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(1024 * 1024), b''):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def transcription_cache_key(audio_hash, params):
+    """Cache key from the audio hash and every parameter that affects the result"""
+    key_params = dict(params, compute_type=MODEL_COMPUTE_TYPE, **TRANSCRIBE_OPTIONS)
+    if not params.get('parallel'):
+        # Window settings only matter for parallel runs
+        key_params.pop('chunk_ms', None)
+        key_params.pop('overlap_ms', None)
+    if not params.get('batched'):
+        key_params.pop('batch_size', None)
+    payload = audio_hash + json.dumps(key_params, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def lookup_cached_result(audio, params):
+    """
+    Resolve the per-request cache mode and look up the result, returning
+    (cache_key, cached_result, error_response)
+
+    cache=true (default) uses the cache, cache=false bypasses it and
+    cache=refresh invalidates the entry so the result is recomputed.
+    Uploads are hashed before they are saved, so hits skip the temp file entirely.
+    """
+    mode = request.form.get('cache', 'true').strip().lower()
+    if mode not in ('true', 'false', 'refresh'):
+        return None, None, (jsonify({'error': 'cache must be one of: true, false, refresh'}), 400)
+
+    if mode == 'false' or not result_cache.enabled:
+        return None, None, None
+
+    cache_key = transcription_cache_key(audio.content_hash(), params)
+    if mode == 'refresh':
+        result_cache.invalidate(cache_key)
+        return cache_key, None, None
+
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Result cache hit for '{audio.filename}'")
+    return cache_key, cached, None
+
 
 @app.route('/health', methods=['GET'])
 def health():
     """Service health check"""
+    pool_stats = model_pool.stats()
+    loaded = pool_stats['loaded_models']
     return jsonify({
         'status': 'healthy',
         'service': 'faster-whisper',
-        'model_loaded': current_model is not None,
-        'current_model': current_model_name
+        'model_loaded': bool(loaded),
+        'current_model': loaded[-1] if loaded else None,
+        'model_pool': pool_stats,
+        'job_queue': job_queue.stats(),
+        'result_cache': result_cache.stats()
     }), 200
 
+def format_segment(segment):
+    """Convert a faster-whisper segment to a response dict"""
+    return {
+        'start': round(segment.start, 2),
+        'end': round(segment.end, 2),
+        'text': segment.text.strip()
+    }
+
+
+def encode_stream_record(stream_format, record_type, payload):
+    """Encode a single streaming record as an NDJSON line or an SSE event"""
+    if stream_format == 'sse':
+        return f"event: {record_type}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    return json.dumps({'type': record_type, **payload}, ensure_ascii=False) + '\n'
+
+
+def remove_temp_file(path):
+    """Remove a temporary upload, logging failures"""
+    try:
+        os.unlink(path)
+        logger.info(f"Temporary file removed: {path}")
+    except Exception as e:
+        logger.warning(f"Failed to remove temporary file: {str(e)}")
+
+
+def stream_transcription(stream_format, segments, info, model_name, on_complete=None):
+    """Yield each segment as soon as it is decoded, then a summary record"""
+    try:
+        count = 0
+        collected = [] if on_complete is not None else None
+        for segment in segments:
+            record = format_segment(segment)
+            yield encode_stream_record(stream_format, 'segment', record)
+            count += 1
+            if collected is not None:
+                collected.append(record)
+
+        yield encode_stream_record(stream_format, 'summary', {
+            'language': info.language,
+            'language_probability': round(info.language_probability, 2),
+            'duration': round(info.duration, 2),
+            'segments_count': count,
+            'model': model_name
+        })
+        logger.info(f"Streaming transcription completed. Language: {info.language}, Duration: {info.duration:.2f}s")
+        if on_complete is not None:
+            on_complete(build_result(collected, info, model_name))
+    except Exception as e:
+        logger.error(f"Error during streaming transcription: {str(e)}")
+        yield encode_stream_record(stream_format, 'error', {'error': str(e)})
+
+
+class AudioInput:
+    """Audio to transcribe: a multipart upload or a file on an allow-listed shared volume"""
+
+    def __init__(self, filename, upload=None, path=None):
+        self.filename = filename
+        self.upload = upload
+        self.path = path  # shared file, or the temp copy once an upload is saved
+
+    @property
+    def is_upload(self):
+        return self.upload is not None
+
+    def content_hash(self):
+        if self.is_upload:
+            return audio_content_hash(self.upload.stream)
+        with open(self.path, 'rb') as fh:
+            return audio_content_hash(fh)
+
+    def local_path(self):
+        """Path to decode from; uploads are saved to a temp file on first use"""
+        if self.path is None:
+            self.path = save_upload(self.upload)
+        return self.path
+
+    def release(self):
+        """Remove the temp copy of an upload; shared files are never touched"""
+        if self.is_upload and self.path is not None:
+            remove_temp_file(self.path)
+            self.path = None
+
+
+def resolve_shared_path(raw_path):
+    """Resolve a file path under one of ALLOWED_ROOTS, returning (path, error_response)"""
+    if not ALLOWED_ROOTS:
+        return None, (jsonify({'error': 'Transcribing by path is disabled'}), 403)
+
+    resolved = os.path.realpath(raw_path)
+    if not any(resolved == root or resolved.startswith(root + os.sep) for root in ALLOWED_ROOTS):
+        return None, (jsonify({
+            'error': 'Path is outside the allowed roots',
+            'allowed_roots': ALLOWED_ROOTS
+        }), 403)
+
+    if not os.path.isfile(resolved):
+        return None, (jsonify({'error': f'File not found: {raw_path}'}), 404)
+
+    if not allowed_file(resolved):
+        return None, (jsonify({
+            'error': 'Unsupported file format',
+            'allowed_formats': list(ALLOWED_EXTENSIONS)
+        }), 400)
+
+    return resolved, None
+
+
+def get_audio_input():
+    """Read the audio from the 'file' upload or the 'path' field, returning (audio, error_response)"""
+    if 'file' not in request.files:
+        raw_path = request.form.get('path', '').strip()
+        if raw_path:
+            path, error = resolve_shared_path(raw_path)
+            if error is not None:
+                return None, error
+            return AudioInput(os.path.basename(path), path=path), None
+        return None, (jsonify({'error': 'File not provided'}), 400)
+
+    file = request.files['file']
+
+    if file.filename == '':
+        return None, (jsonify({'error': 'No file selected'}), 400)
+
+    if not allowed_file(file.filename):
+        return None, (jsonify({
+            'error': 'Unsupported file format',
+            'allowed_formats': list(ALLOWED_EXTENSIONS)
+        }), 400)
+
+    return AudioInput(file.filename, upload=file), None
+
+
+def get_transcription_params():
+    """Read common transcription parameters from the form, returning (params, error_response)"""
+    params = {
+        'model_name': request.form.get('model', 'base'),
+        'language': request.form.get('language', None),  # None for auto-detect
+        'task': request.form.get('task', 'transcribe'),  # transcribe or translate
+        'parallel': request.form.get('parallel', 'false').strip().lower() == 'true',
+        'batched': request.form.get('batched', str(BATCHED_DEFAULT)).strip().lower() == 'true',
+    }
+
+    try:
+        params['chunk_ms'] = int(request.form.get('chunk_ms', PARALLEL_CHUNK_MS))
+        params['overlap_ms'] = int(request.form.get('overlap_ms', PARALLEL_OVERLAP_MS))
+        params['batch_size'] = int(request.form.get('batch_size', BATCH_SIZE))
+    except ValueError:
+        return None, (jsonify({'error': 'chunk_ms, overlap_ms and batch_size must be integers'}), 400)
+
+    if params['batch_size'] <= 0:
+        return None, (jsonify({'error': 'batch_size must be > 0'}), 400)
+
+    if params['chunk_ms'] <= 0:
+        return None, (jsonify({'error': 'chunk_ms must be > 0'}), 400)
+    if params['overlap_ms'] < 0:
+        return None, (jsonify({'error': 'overlap_ms must be >= 0'}), 400)
+    if params['overlap_ms'] >= params['chunk_ms']:
+        return None, (jsonify({'error': 'overlap_ms must be smaller than chunk_ms'}), 400)
+
+    return params, None
+
+
+def save_upload(file):
+    """Save an uploaded file to a temp file and return its path"""
+    temp_file = tempfile.NamedTemporaryFile(
+        delete=False,
+        suffix=Path(file.filename).suffix,
+        dir=TEMP_DIR
+    )
+    try:
+        file.save(temp_file.name)
+    finally:
+        temp_file.close()
+    logger.info(f"File saved: {temp_file.name}")
+    return temp_file.name
+
+
+def decode_with_model(model, audio, language, task, batched=False, batch_size=BATCH_SIZE):
+    """Run a loaded model over audio, optionally through the batched pipeline"""
+    if batched:
+        # The pipeline splits audio on VAD boundaries and decodes batch_size chunks at once
+        pipeline = BatchedInferencePipeline(model=model)
+        return pipeline.transcribe(
+            audio,
+            language=language,
+            task=task,
+            batch_size=batch_size,
+            **TRANSCRIBE_OPTIONS
+        )
+    return model.transcribe(
+        audio,
+        language=language,
+        task=task,
+        **TRANSCRIBE_OPTIONS
+    )
+
+
+def start_transcription(audio_path, model_name, language, task, parallel=False,
+                        chunk_ms=PARALLEL_CHUNK_MS, overlap_ms=PARALLEL_OVERLAP_MS,
+                        batched=False, batch_size=BATCH_SIZE):
+    """Start decoding an audio file; segments are yielded lazily"""
+    if parallel:
+        audio = decode_audio(audio_path, sampling_rate=SAMPLE_RATE)
+        if len(audio) > chunk_ms * SAMPLE_RATE // 1000:
+            return start_parallel_transcription(
+                audio, model_name, language, task, chunk_ms, overlap_ms, batched, batch_size
+            )
+        # Short input: a single window, fall through to the sequential path
+        audio_path = audio
+
+    model = get_whisper_model(model_name)
+
+    mode = f"batched (batch size {batch_size})" if batched else "sequential"
+    logger.info(f"Starting {mode} transcription with model {model_name}, language: {language or 'auto'}, task: {task}")
+
+    return decode_with_model(model, audio_path, language, task, batched, batch_size)
+
+
+def build_result(result_segments, info, model_name):
+    """Build the JSON response from formatted segments"""
+    return {
+        'text': ' '.join(segment['text'] for segment in result_segments),
+        'language': info.language,
+        'language_probability': round(info.language_probability, 2),
+        'duration': round(info.duration, 2),
+        'segments': result_segments,
+        'model': model_name
+    }
+
+
+def collect_transcription(segments, info, model_name, on_segment=None):
+    """Consume all segments and build the JSON response"""
+    result_segments = []
+
+    for segment in segments:
+        result_segments.append(format_segment(segment))
+        if on_segment is not None:
+            on_segment(segment)
+
+    logger.info(f"Transcription completed successfully. Language: {info.language}, Duration: {info.duration:.2f}s")
+
+    return build_result(result_segments, info, model_name)
+
+
+def replay_cached_result(result):
+    """Turn a cached result back into (segments, info) for the streaming path"""
+    segments = (Segment(**segment) for segment in result['segments'])
+    info = SimpleNamespace(
+        language=result['language'],
+        language_probability=result['language_probability'],
+        duration=result['duration']
+    )
+    return segments, info
+
+
+# Per-process worker state for parallel chunked transcription
+Segment = namedtuple('Segment', ['start', 'end', 'text'])
+
+_parallel_executor = None
+_parallel_executor_lock = threading.Lock()
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _init_parallel_worker(cpu_threads):
+    """Give each worker process its own model pool with a share of the CPU threads"""
+    global model_pool
+    model_pool = ModelPool(
+        MODEL_POOL_BUDGET_MB,
+        loader=lambda name: load_whisper_model(name, cpu_threads=cpu_threads)
+    )
+
+
+def _transcribe_window(audio, offset, model_name, language, task, batched, batch_size):
+    """Transcribe one window in a worker process; timestamps are shifted by offset"""
+    model = get_whisper_model(model_name)
+    segments, info = decode_with_model(model, audio, language, task, batched, batch_size)
+    result = [
+        (segment.start + offset, segment.end + offset, segment.text.strip())
+        for segment in segments
+    ]
+    return result, info.language, info.language_probability
+
+
+def get_parallel_executor():
+    """Process pool shared by all parallel requests, created on first use"""
+    global _parallel_executor
+    with _parallel_executor_lock:
+        if _parallel_executor is None:
+            cpu_threads = max(1, (os.cpu_count() or 1) // PARALLEL_WORKERS)
+            logger.info(f"Starting {PARALLEL_WORKERS} transcription worker processes ({cpu_threads} threads each)")
+            # spawn avoids forking a process that already runs CTranslate2 threads
+            _parallel_executor = ProcessPoolExecutor(
+                max_workers=PARALLEL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_parallel_worker,
+                initargs=(cpu_threads,)
+            )
+        return _parallel_executor
+
+
+def plan_windows(total_samples, chunk_ms, overlap_ms):
+    """Sliding windows (start, end) in samples, matching the splitter's chunk_ms/overlap_ms"""
+    chunk = chunk_ms * SAMPLE_RATE // 1000
+    overlap = overlap_ms * SAMPLE_RATE // 1000
+    windows = []
+    start = 0
+    while start < total_samples:
+        end = min(start + chunk, total_samples)
+        windows.append((start, end))
+        if end >= total_samples:
+            break
+        start = end - overlap
+    return windows
+
+
+def _normalize_words(text):
+    return [word.lower() for word in WORD_RE.findall(text)]
+
+
+def trim_repeated_prefix(previous_text, text, min_words=2):
+    """Drop the leading words of text that repeat the tail of previous_text"""
+    previous = _normalize_words(previous_text)
+    current = _normalize_words(text)
+    best = 0
+    for size in range(min(len(previous), len(current)), 0, -1):
+        if previous[-size:] == current[:size]:
+            best = size
+            break
+    if best == 0 or (best < min_words and best < len(current)):
+        return text
+    if best == len(current):
+        return ''
+    # Cut after the best-th word in the original text to keep punctuation intact
+    matches = list(WORD_RE.finditer(text))
+    return text[matches[best].start():].strip()
+
+
+class ParallelInfo:
+    """Transcription info for a parallel run; language is settled as windows complete"""
+
+    def __init__(self, duration):
+        self.duration = duration
+        self.language = None
+        self.language_probability = 0.0
+        self._language_weights = {}
+
+    def add_window(self, language, probability, seconds):
+        weight = self._language_weights.get(language, 0.0) + probability * seconds
+        self._language_weights[language] = weight
+        self.language = max(self._language_weights, key=self._language_weights.get)
+        if language == self.language:
+            self.language_probability = max(self.language_probability, probability)
+
+
+def start_parallel_transcription(audio, model_name, language, task, chunk_ms, overlap_ms,
+                                 batched=False, batch_size=BATCH_SIZE):
+    """
+    Transcribe overlapping windows in worker processes and merge them on the global timeline
+
+    Each overlap region is split at its midpoint: a window keeps only the segments
+    whose centre lies on its side of the cut, and words repeated across the seam
+    are trimmed from the first segment of the following window.
+    """
+    windows = plan_windows(len(audio), chunk_ms, overlap_ms)
+    info = ParallelInfo(len(audio) / SAMPLE_RATE)
+    logger.info(f"Parallel transcription: {len(windows)} windows of {chunk_ms} ms with {overlap_ms} ms overlap")
+
+    # Cut points (seconds) in the middle of each overlap region
+    cuts = [
+        (next_start + current_end) / 2 / SAMPLE_RATE
+        for (_, current_end), (next_start, _) in zip(windows, windows[1:])
+    ]
+
+    def generate():
+        executor = get_parallel_executor()
+        # Bound in-flight windows so pickled audio copies don't pile up
+        max_in_flight = PARALLEL_WORKERS * 2
+        pending = deque()
+        next_window = 0
+        last_text = ''
+        try:
+            for index in range(len(windows)):
+                while next_window < len(windows) and len(pending) < max_in_flight:
+                    start, end = windows[next_window]
+                    pending.append(executor.submit(
+                        _transcribe_window, audio[start:end], start / SAMPLE_RATE,
+                        model_name, language, task, batched, batch_size
+                    ))
+                    next_window += 1
+
+                window_segments, window_language, probability = pending.popleft().result()
+                start, end = windows[index]
+                info.add_window(window_language, probability, (end - start) / SAMPLE_RATE)
+
+                lower = cuts[index - 1] if index > 0 else float('-inf')
+                upper = cuts[index] if index < len(cuts) else float('inf')
+                # Only the first kept segment after a seam can repeat the previous window
+                at_seam = index > 0
+                for seg_start, seg_end, text in window_segments:
+                    if not lower <= (seg_start + seg_end) / 2 < upper:
+                        continue
+                    if at_seam:
+                        text = trim_repeated_prefix(last_text, text)
+                        at_seam = False
+                    if not text:
+                        continue
+                    yield Segment(seg_start, seg_end, text)
+                    last_text = text
+        finally:
+            for future in pending:
+                future.cancel()
+
+    return generate(), info
+
+
 @app.route('/transcribe', methods=['POST'])
 def transcribe():
     """
@@ -64,10 +821,18 @@ def transcribe():
 
     Accepts:
     - file: MP3/WAV/M4A file (multipart/form-data)
+    - path: alternatively, path of a file under WHISPER_ALLOWED_ROOTS
+      (e.g. /downloads or /shared); it is decoded in place without a copy
     - model: model name (optional, default 'base')
       Available models: tiny, base, small, medium, large
     - language: language code (optional, auto-detect if not provided)
     - task: transcribe or translate (optional, default transcribe)
+    - stream: ndjson or sse (optional); emit segments as they are decoded,
+      followed by a summary record with language and duration
+    - batched: true/false (optional, default WHISPER_BATCHED); decode through
+      the batched pipeline, batch_size (optional, default WHISPER_BATCH_SIZE)
+    - cache: true (default), false to bypass the result cache,
+      refresh to invalidate the cached result and transcribe again
 
     Returns:
     - text: transcribed text
@@ -75,91 +840,325 @@ def transcribe():
     - language: detected language
     """
     try:
-        # Check for file
-        if 'file' not in request.files:
-            return jsonify({'error': 'File not provided'}), 400
+        audio, error = get_audio_input()
+        if error is not None:
+            return error
 
-        file = request.files['file']
-        
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+        # Get parameters
+        params, error = get_transcription_params()
+        if error is not None:
+            return error
+        stream_format = request.form.get('stream', '').strip().lower() or None
 
-        if not allowed_file(file.filename):
+        if stream_format is not None and stream_format not in STREAM_FORMATS:
             return jsonify({
-                'error': 'Unsupported file format',
-                'allowed_formats': list(ALLOWED_EXTENSIONS)
+                'error': 'Unsupported stream format',
+                'allowed_stream_formats': list(STREAM_FORMATS)
             }), 400
-        
-        # Get parameters
-        model_name = request.form.get('model', 'base')
-        language = request.form.get('language', None)  # None for auto-detect
-        task = request.form.get('task', 'transcribe')  # transcribe or translate
-
-        # Save temp file
-        temp_file = tempfile.NamedTemporaryFile(
-            delete=False,
-            suffix=Path(file.filename).suffix,
-            dir=TEMP_DIR
-        )
-        
+
+        cache_key, cached, error = lookup_cached_result(audio, params)
+        if error is not None:
+            return error
+
+        if cached is not None:
+            if stream_format is not None:
+                segments, info = replay_cached_result(cached)
+                return Response(
+                    stream_transcription(stream_format, segments, info, cached['model']),
+                    mimetype=STREAM_FORMATS[stream_format],
+                    headers={'Cache-Control': 'no-cache', 'X-Cache': 'HIT'}
+                )
+            return jsonify(dict(cached, cached=True)), 200
+
+        store = (lambda result: result_cache.put(cache_key, result)) if cache_key else None
+
+        # Streaming responses remove the temp file when the response is closed
+        cleanup_here = True
+
         try:
-            file.save(temp_file.name)
-            temp_file.close()
-            
-            logger.info(f"File saved: {temp_file.name}")
-
-            # Get model
-            model = get_whisper_model(model_name)
-            
-            # Transcription
-            logger.info(f"Starting transcription of '{file.filename}' with model {model_name}, language: {language or 'auto'}, task: {task}")
-
-            segments, info = model.transcribe(
-                temp_file.name,
-                language=language,
-                task=task,
-                beam_size=5,
-                vad_filter=True,  # Voice Activity Detection for better quality
-                vad_parameters=dict(min_silence_duration_ms=500)
-            )
-            
-            # Build result
-            result_segments = []
-            full_text = []
-            
-            for segment in segments:
-                result_segments.append({
-                    'start': round(segment.start, 2),
-                    'end': round(segment.end, 2),
-                    'text': segment.text.strip()
-                })
-                full_text.append(segment.text.strip())
-            
-            response = {
-                'text': ' '.join(full_text),
-                'language': info.language,
-                'language_probability': round(info.language_probability, 2),
-                'duration': round(info.duration, 2),
-                'segments': result_segments,
-                'model': model_name
-            }
-            
-            logger.info(f"Transcription completed successfully. Language: {info.language}, Duration: {info.duration:.2f}s")
+            segments, info = start_transcription(audio.local_path(), **params)
+
+            if stream_format is not None:
+                streamed = Response(
+                    stream_with_context(stream_transcription(stream_format, segments, info, params['model_name'], store)),
+                    mimetype=STREAM_FORMATS[stream_format],
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+                )
+                streamed.call_on_close(audio.release)
+                cleanup_here = False
+                return streamed
+
+            result = collect_transcription(segments, info, params['model_name'])
+            if store is not None:
+                store(result)
+            return jsonify(dict(result, cached=False)), 200
 
-            return jsonify(response), 200
-            
         finally:
             # Remove temp file
-            try:
-                os.unlink(temp_file.name)
-                logger.info(f"Temporary file removed: {temp_file.name}")
-            except Exception as e:
-                logger.warning(f"Failed to remove temporary file: {str(e)}")
+            if cleanup_here:
+                audio.release()
 
     except Exception as e:
         logger.error(f"Error during transcription: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+
+class JobCancelled(Exception):
+    """Raised inside a worker when a running job is cancelled"""
+
+
+class TranscriptionJob:
+    """State of a single asynchronous transcription job"""
+
+    def __init__(self, audio, params, cache_key=None):
+        self.id = uuid.uuid4().hex
+        self.audio = audio
+        self.filename = audio.filename
+        self.params = params
+        self.cache_key = cache_key
+        self.status = 'queued'  # queued, running, completed, failed, cancelled
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'progress': round(self.progress, 4),
+            'filename': self.filename,
+            'model': self.params['model_name'],
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobQueue:
+    """Bounded queue of transcription jobs served by a fixed pool of worker threads"""
+
+    def __init__(self, workers, max_queued, ttl_seconds):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl_seconds = ttl_seconds
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _ensure_workers(self):
+        """Start worker threads on first use (lock held)"""
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, name=f"whisper-job-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _purge_expired(self):
+        """Forget finished jobs older than the TTL (lock held)"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and now - job.finished_at > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def queued_count(self):
+        return sum(1 for job in self._jobs.values() if job.status == 'queued')
+
+    def submit(self, job):
+        """Admit a job, returning False when the queue is full"""
+        with self._lock:
+            self._purge_expired()
+            if self.queued_count() >= self.max_queued:
+                return False
+            self._jobs[job.id] = job
+            self._ensure_workers()
+        self._queue.put(job)
+        logger.info(f"Job {job.id} queued for '{job.filename}'")
+        return True
+
+    def add_completed(self, job, result):
+        """Register a job whose result is already known (e.g. from the result cache)"""
+        now = time.time()
+        with self._lock:
+            self._purge_expired()
+            job.result = result
+            job.progress = 1.0
+            job.status = 'completed'
+            job.started_at = job.finished_at = now
+            self._jobs[job.id] = job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns the job or None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+            job.cancel_event.set()
+            if job.status == 'queued':
+                job.status = 'cancelled'
+                job.finished_at = time.time()
+        logger.info(f"Job {job_id} cancellation requested")
+        return job
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {
+                'workers': self.workers,
+                'max_queued': self.max_queued,
+                'jobs': counts,
+            }
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            finally:
+                job.audio.release()
+                self._queue.task_done()
+
+    def _run(self, job):
+        with self._lock:
+            if job.cancel_event.is_set():
+                return
+            job.status = 'running'
+            job.started_at = time.time()
+
+        try:
+            segments, info = start_transcription(job.audio.local_path(), **job.params)
+
+            def on_segment(segment):
+                if job.cancel_event.is_set():
+                    raise JobCancelled()
+                if info.duration:
+                    job.progress = min(segment.end / info.duration, 1.0)
+
+            result = collect_transcription(segments, info, job.params['model_name'], on_segment)
+            if job.cache_key is not None:
+                result_cache.put(job.cache_key, result)
+            # finished_at is set together with the final status: _purge_expired reads both under the lock
+            with self._lock:
+                job.result = result
+                job.progress = 1.0
+                job.status = 'completed'
+                job.finished_at = time.time()
+        except JobCancelled:
+            with self._lock:
+                job.status = 'cancelled'
+                job.finished_at = time.time()
+            logger.info(f"Job {job.id} cancelled")
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            with self._lock:
+                job.error = str(e)
+                job.status = 'failed'
+                job.finished_at = time.time()
+
+
+job_queue = JobQueue(JOB_WORKERS, JOB_QUEUE_SIZE, JOB_TTL_SECONDS)
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Submit an asynchronous transcription job
+
+    Accepts the same multipart parameters as /transcribe (except stream).
+    Returns 202 with the job id, 200 with an already completed job on a
+    result cache hit, or 429 when the queue is full.
+    """
+    try:
+        audio, error = get_audio_input()
+        if error is not None:
+            return error
+
+        params, error = get_transcription_params()
+        if error is not None:
+            return error
+
+        cache_key, cached, error = lookup_cached_result(audio, params)
+        if error is not None:
+            return error
+
+        job = TranscriptionJob(audio, params, cache_key)
+        if cached is not None:
+            job_queue.add_completed(job, dict(cached, cached=True))
+            return jsonify(job.to_dict()), 200
+
+        # Save uploads now: the request stream is gone by the time a worker runs
+        audio.local_path()
+
+        if not job_queue.submit(job):
+            audio.release()
+            response = jsonify({
+                'error': 'Job queue is full, retry later',
+                'max_queued': job_queue.max_queued
+            })
+            response.headers['Retry-After'] = '30'
+            return response, 429
+
+        return jsonify(job.to_dict()), 202
+
+    except Exception as e:
+        logger.error(f"Error submitting job: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status and progress (0..1, by last segment end vs. audio duration)"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Transcription result; 202 while the job is still queued or running"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status == 'completed':
+        return jsonify(job.result), 200
+    if job.finished:
+        return jsonify(job.to_dict()), 409
+    return jsonify(job.to_dict()), 202
+
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/cache', methods=['DELETE'])
+def clear_cache():
+    """Remove all cached transcription results"""
+    removed = result_cache.clear()
+    logger.info(f"Result cache cleared: {removed} entries removed")
+    return jsonify({'status': 'cleared', 'removed': removed}), 200
+
 @app.route('/models', methods=['GET'])
 def list_models():
     """List available Whisper models"""
@@ -201,9 +1200,21 @@ def info():
         'version': '1.0.0',
         'description': 'API for transcribing audio files using faster-whisper',
         'supported_formats': list(ALLOWED_EXTENSIONS),
+        'runtime': {
+            'device': MODEL_DEVICE,
+            'compute_type': MODEL_COMPUTE_TYPE,
+            'cpu_threads': MODEL_CPU_THREADS,
+            'num_workers': MODEL_NUM_WORKERS,
+            'batched_default': BATCHED_DEFAULT,
+            'batch_size': BATCH_SIZE
+        },
         'endpoints': {
             '/health': 'GET - Service health check',
             '/transcribe': 'POST - Transcribe an audio file',
+            '/jobs': 'POST - Submit an asynchronous transcription job',
+            '/jobs/<id>': 'GET - Job status and progress, DELETE - cancel job',
+            '/jobs/<id>/result': 'GET - Transcription result of a job',
+            '/cache': 'DELETE - Clear the transcription result cache',
             '/models': 'GET - List available models',
             '/info': 'GET - Service information'
         }
@@ -211,4 +1222,4 @@ def info():
 
 if __name__ == '__main__':
     logger.info("Starting Whisper Transcription Service on port 8082")
-    app.run(host='0.0.0.0', port=8082, debug=False)
+    app.run(host='0.0.0.0', port=8082, debug=False, threaded=True)
@@ -0,0 +1,279 @@
+"""
+Real-time-factor benchmark suite for the Whisper service
+
+Runs fixed local audio fixtures through every combination of model size,
+compute type and decoding mode (sequential and batched per batch size),
+using the same loading and decoding code as the service
+(app.load_whisper_model / app.decode_with_model). For each configuration
+it reports:
+
+- rtf: total processing time / total audio duration (lower is faster)
+- ttfs_seconds: mean time from the transcribe call to the first segment
+- load_seconds: model load time
+- peak_rss_mb: peak resident memory of the process running the configuration
+- wer: word error rate against <audio>.txt when a reference transcript exists
+  (batched runs without one are compared to the sequential transcript)
+
+Every configuration runs in a fresh process so load time and peak RSS are
+not skewed by earlier runs. Results are written as JSON tagged with the
+commit, so runs can be compared across commits with --compare.
+
+Runs offline: models must already be in the local cache (whisper_models volume).
+
+Usage:
+    python benchmark.py fixtures/ --models tiny base small --compute-types int8 float32 \\
+        --batch-sizes 8 16 --output results.json
+    python benchmark.py fixtures/ --output new.json --compare results.json --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+
+# Never reach out to the Hugging Face Hub: only locally cached models are used
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+
+from faster_whisper import decode_audio  # noqa: E402
+
+import app  # noqa: E402
+
+DEFAULT_MODELS = ['tiny', 'base', 'small', 'medium', 'large']
+DEFAULT_COMPUTE_TYPES = ['int8', 'float32']
+AUDIO_SUFFIXES = {f".{ext}" for ext in app.ALLOWED_EXTENSIONS}
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level Levenshtein distance divided by the reference length"""
+    ref = app._normalize_words(reference)
+    hyp = app._normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            ))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def find_fixtures(inputs):
+    """Expand files and directories into a sorted list of audio fixtures"""
+    fixtures = []
+    for path in inputs:
+        if path.is_dir():
+            fixtures.extend(p for p in path.iterdir() if p.suffix.lower() in AUDIO_SUFFIXES)
+        else:
+            fixtures.append(path)
+    return sorted(fixtures)
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_configuration(model_name, compute_type, batch_size, fixtures, language):
+    """Benchmark one configuration; runs in a dedicated process"""
+    started = time.perf_counter()
+    model = app.load_whisper_model(model_name, compute_type=compute_type)
+    load_seconds = time.perf_counter() - started
+
+    batched = batch_size is not None
+    files = []
+    for path in fixtures:
+        audio = decode_audio(str(path), sampling_rate=app.SAMPLE_RATE)
+        duration = len(audio) / app.SAMPLE_RATE
+
+        started = time.perf_counter()
+        first_segment = None
+        texts = []
+        segments, _ = app.decode_with_model(model, audio, language, 'transcribe', batched, batch_size)
+        for segment in segments:
+            if first_segment is None:
+                first_segment = time.perf_counter() - started
+            texts.append(segment.text.strip())
+        elapsed = time.perf_counter() - started
+
+        files.append({
+            'file': path.name,
+            'duration': round(duration, 2),
+            'seconds': round(elapsed, 3),
+            'rtf': round(elapsed / duration, 4) if duration else None,
+            'ttfs_seconds': round(first_segment, 3) if first_segment is not None else None,
+            'text': ' '.join(texts),
+        })
+
+    return {
+        'load_seconds': round(load_seconds, 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'files': files,
+    }
+
+
+def summarize(config, measured, references, sequential_texts):
+    """Aggregate per-file measurements of a configuration into one result row"""
+    files = measured['files']
+    total_seconds = sum(f['seconds'] for f in files)
+    total_duration = sum(f['duration'] for f in files)
+    ttfs = [f['ttfs_seconds'] for f in files if f['ttfs_seconds'] is not None]
+
+    wers = []
+    for f in files:
+        reference = references.get(f['file']) or sequential_texts.get(f['file'])
+        if reference is not None:
+            f['wer'] = round(word_error_rate(reference, f['text']), 4)
+            wers.append(f['wer'])
+        else:
+            f['wer'] = None
+
+    return {
+        **config,
+        'load_seconds': measured['load_seconds'],
+        'peak_rss_mb': measured['peak_rss_mb'],
+        'rtf': round(total_seconds / total_duration, 4) if total_duration else None,
+        'ttfs_seconds': round(sum(ttfs) / len(ttfs), 3) if ttfs else None,
+        'wer': round(sum(wers) / len(wers), 4) if wers else None,
+        'files': files,
+    }
+
+
+def config_key(result):
+    return (result['model'], result['compute_type'], result['mode'], result['batch_size'])
+
+
+def compare(results, baseline, threshold):
+    """Print RTF/TTFS/RSS deltas against a baseline run; returns the number of regressions"""
+    previous = {config_key(r): r for r in baseline['results']}
+    print(f"\nComparison with {baseline.get('commit') or 'baseline'} (threshold {threshold:.0%}):")
+    regressions = 0
+    for result in results:
+        base = previous.get(config_key(result))
+        if base is None or not base.get('rtf') or not result.get('rtf'):
+            continue
+        flags = []
+        for metric in ('rtf', 'ttfs_seconds', 'peak_rss_mb', 'load_seconds'):
+            old, new = base.get(metric), result.get(metric)
+            if old and new is not None:
+                change = (new - old) / old
+                if change > threshold:
+                    flags.append(f"{metric} +{change:.0%}")
+        rtf_change = (result['rtf'] - base['rtf']) / base['rtf']
+        status = 'REGRESSION ' + ', '.join(flags) if flags else 'ok'
+        regressions += bool(flags)
+        print(f"  {format_config(result):40} RTF {base['rtf']:.3f} -> {result['rtf']:.3f} ({rtf_change:+.0%})  {status}")
+    return regressions
+
+
+def format_config(result):
+    mode = 'sequential' if result['batch_size'] is None else f"batched x{result['batch_size']}"
+    return f"{result['model']}/{result['compute_type']}/{mode}"
+
+
+def current_commit():
+    """Commit being benchmarked: BENCHMARK_COMMIT, else git if available"""
+    if os.environ.get('BENCHMARK_COMMIT'):
+        return os.environ['BENCHMARK_COMMIT']
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('fixtures', nargs='+', type=Path, help='Audio fixture files or directories')
+    parser.add_argument('--models', nargs='+', default=DEFAULT_MODELS, help='Model names (default: all sizes)')
+    parser.add_argument('--compute-types', nargs='+', default=DEFAULT_COMPUTE_TYPES,
+                        help='CTranslate2 compute types (default: int8 float32)')
+    parser.add_argument('--batch-sizes', nargs='*', type=int, default=[8],
+                        help='Batch sizes for batched mode; pass none to benchmark sequential only')
+    parser.add_argument('--language', default=None, help='Language code (default: auto-detect)')
+    parser.add_argument('--output', type=Path, default=None, help='Write results as JSON to this file')
+    parser.add_argument('--compare', type=Path, default=None, help='Baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Relative slowdown treated as a regression (default: 0.1)')
+    args = parser.parse_args()
+
+    fixtures = find_fixtures(args.fixtures)
+    if not fixtures:
+        parser.error('no audio fixtures found')
+    references = {
+        path.name: path.with_suffix('.txt').read_text(encoding='utf-8')
+        for path in fixtures if path.with_suffix('.txt').exists()
+    }
+
+    results = []
+    for model_name in args.models:
+        for compute_type in args.compute_types:
+            sequential_texts = {}
+            for batch_size in [None] + args.batch_sizes:
+                config = {
+                    'model': model_name,
+                    'compute_type': compute_type,
+                    'mode': 'sequential' if batch_size is None else 'batched',
+                    'batch_size': batch_size,
+                }
+                # A fresh process per configuration isolates load time and peak RSS
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                    measured = executor.submit(
+                        run_configuration, model_name, compute_type, batch_size, fixtures, args.language
+                    ).result()
+
+                result = summarize(config, measured, references, sequential_texts)
+                if batch_size is None:
+                    sequential_texts = {f['file']: f['text'] for f in measured['files']}
+                results.append(result)
+
+                wer = '-' if result['wer'] is None else f"{result['wer']:.3f}"
+                rtf = '-' if result['rtf'] is None else f"{result['rtf']:.3f}"
+                ttfs = '-' if result['ttfs_seconds'] is None else f"{result['ttfs_seconds']}s"
+                print(f"{format_config(result):40} RTF {rtf}  TTFS {ttfs}  "
+                      f"load {result['load_seconds']:.1f}s  RSS {result['peak_rss_mb']:.0f} MB  WER {wer}")
+
+    report = {
+        'commit': current_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'host': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'device': app.MODEL_DEVICE,
+            'cpu_threads': app.MODEL_CPU_THREADS,
+            'num_workers': app.MODEL_NUM_WORKERS,
+        },
+        'fixtures': [
+            {'file': path.name, 'size_bytes': path.stat().st_size, 'reference': path.name in references}
+            for path in fixtures
+        ],
+        'results': results,
+    }
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding='utf-8'))
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,16 +3,452 @@ from flask_cors import CORS
 import yt_dlp
 import os
 import json
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# Logging setup
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
 
 DOWNLOAD_DIR = '/downloads'
 
+# Persistent index of finished downloads: (video, variant) -> file, size and sha256.
+# Lives in the downloads volume so it survives restarts together with the files.
+INDEX_PATH = os.environ.get('YTDLP_INDEX_PATH', os.path.join(DOWNLOAD_DIR, '.download-index.sqlite3'))
+# Leftovers of unfinished downloads and SQLite side files; never indexed
+PARTIAL_SUFFIXES = ('.part', '.ytdl', '.temp', '.tmp', '-wal', '-shm', '-journal')
+
+# Extracted metadata is shared by /info, /download and /download-transcript for
+# METADATA_TTL seconds, so the extractor runs at most once per video in that window.
+# Keep the TTL well below the lifetime of signed media URLs (hours on YouTube),
+# since /download starts downloads from the cached formats.
+METADATA_TTL = float(os.environ.get('YTDLP_METADATA_TTL', '600'))
+METADATA_MAX_ENTRIES = int(os.environ.get('YTDLP_METADATA_MAX_ENTRIES', '1000'))
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Options of the metadata extraction; downloads reuse its result
+INFO_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': False,
+    # Add options to bypass some YouTube restrictions
+    'extractor_args': {
+        'youtube': {
+            'player_client': ['android', 'web']
+        }
+    },
+    # Add User-Agent
+    'http_headers': {
+        'User-Agent': USER_AGENT
+    }
+}
+
+YOUTUBE_ID_RE = re.compile(
+    r'(?:youtube(?:-nocookie)?\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/|v/)|youtu\.be/)([0-9A-Za-z_-]{11})'
+)
+# Query parameters that never change which video a URL points to
+TRACKING_PARAMS = {'si', 'feature', 'fbclid', 'gclid', 'igshid', 'ref', 'ref_src'}
+
+
+def metadata_key(url):
+    """Cache key of a URL: the video id for YouTube, else the URL without tracking noise"""
+    match = YOUTUBE_ID_RE.search(url)
+    if match:
+        return f"youtube:{match.group(1)}"
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix('www.')
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name not in TRACKING_PARAMS and not name.startswith('utm_')
+    )
+    return f"{host}{parts.path.rstrip('/')}" + (f"?{urlencode(query)}" if query else '')
+
+
+def video_key(info):
+    """Key of an extracted video, independent of the URL it was reached by"""
+    return f"{info['extractor_key'].lower()}:{info['id']}"
+
+
+def extraction_url(url):
+    """URL handed to the extractor; YouTube links are reduced to the video they name"""
+    match = YOUTUBE_ID_RE.search(url)
+    if match:
+        return f"https://www.youtube.com/watch?v={match.group(1)}"
+    return url
+
+
+def extract_metadata(url):
+    """Run the yt-dlp extractor once, without downloading"""
+    with yt_dlp.YoutubeDL(INFO_OPTS) as ydl:
+        return ydl.extract_info(extraction_url(url), download=False)
+
+
+class _PendingExtraction:
+    """Extraction in progress; concurrent requests for the same video wait on it"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.info = None
+        self.error = None
+
+
+class MetadataCache:
+    """TTL cache of extracted metadata with LRU eviction, keyed by metadata_key()"""
+
+    def __init__(self, ttl, max_entries, extractor=extract_metadata):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._extractor = extractor
+        self._entries = OrderedDict()  # key -> (expires_at, info), LRU first
+        self._pending = {}  # key -> _PendingExtraction
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.extractions = 0
+
+    def _store(self, key, info):
+        """Cache info under key and, for YouTube, under the video id (lock held)"""
+        expires_at = time.monotonic() + self.ttl
+        keys = {key}
+        # Only YouTube URLs are looked up by id (metadata_key); other aliases would just take LRU slots
+        if str(info.get('extractor_key', '')).lower() == 'youtube' and info.get('id'):
+            keys.add(video_key(info))
+        for alias in keys:
+            self._entries[alias] = (expires_at, info)
+            self._entries.move_to_end(alias)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, url, refresh=False):
+        """Metadata of url; extracted at most once per TTL across concurrent callers.
+        The returned dict is shared: callers must not modify it."""
+        key = metadata_key(url)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and not refresh and entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+
+                pending = self._pending.get(key)
+                if pending is None:
+                    self._entries.pop(key, None)
+                    self.misses += 1
+                    pending = _PendingExtraction()
+                    self._pending[key] = pending
+                    break
+
+            # Another request is extracting this video; its result serves this one too
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            if pending.info is not None:
+                with self._lock:
+                    self.hits += 1
+                return pending.info
+
+        try:
+            info = self._extractor(url)
+        except Exception as e:
+            pending.error = e
+            with self._lock:
+                del self._pending[key]
+            pending.event.set()
+            raise
+
+        with self._lock:
+            self.extractions += 1
+            del self._pending[key]
+            if self.ttl > 0:
+                self._store(key, info)
+        pending.info = info
+        pending.event.set()
+        return info
+
+    def clear(self):
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            return removed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'extractions': self.extractions,
+            }
+
+
+metadata_cache = MetadataCache(METADATA_TTL, METADATA_MAX_ENTRIES)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DownloadIndex:
+    """SQLite index of downloaded files keyed by (video key, variant).
+
+    URL keys (metadata_key) map to video keys, so a repeated request is answered
+    from the index without touching the network. An entry is only trusted while
+    its file exists with the recorded size; reconcile() checks the whole index
+    against the disk and can adopt files downloaded before the index existed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        """Open the database on first use (lock held)"""
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript('''
+                CREATE TABLE IF NOT EXISTS downloads (
+                    video_key TEXT NOT NULL,
+                    variant TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    title TEXT,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (video_key, variant)
+                );
+                CREATE INDEX IF NOT EXISTS downloads_path ON downloads (path);
+                CREATE TABLE IF NOT EXISTS urls (
+                    url_key TEXT PRIMARY KEY,
+                    video_key TEXT NOT NULL
+                );
+            ''')
+            self._db = db
+        return self._db
+
+    def _valid(self, db, row):
+        """Drop an entry whose file is gone or has changed size (lock held)"""
+        try:
+            size = os.path.getsize(row['path'])
+        except OSError:
+            size = None
+        if size == row['size']:
+            return True
+        logger.info(f"Dropping stale index entry {row['video_key']} {row['variant']}: {row['path']}")
+        with db:
+            db.execute('DELETE FROM downloads WHERE video_key = ? AND variant = ?', (row['video_key'], row['variant']))
+        return False
+
+    def _hit(self, db, row):
+        with db:
+            db.execute(
+                'UPDATE downloads SET last_access = ? WHERE video_key = ? AND variant = ?',
+                (time.time(), row['video_key'], row['variant'])
+            )
+        self.hits += 1
+        return dict(row)
+
+    def lookup_url(self, url_key, variant):
+        """Entry for a URL seen before; no network access"""
+        with self._lock:
+            db = self._connect()
+            row = db.execute(
+                '''SELECT d.* FROM urls u JOIN downloads d ON d.video_key = u.video_key
+                   WHERE u.url_key = ? AND d.variant = ?''', (url_key, variant)
+            ).fetchone()
+            if row is None or not self._valid(db, row):
+                return None
+            return self._hit(db, row)
+
+    def lookup_video(self, key, variant, url_key=None):
+        """Entry for an extracted video; url_key is remembered for the next lookup_url"""
+        with self._lock:
+            db = self._connect()
+            row = db.execute(
+                'SELECT * FROM downloads WHERE video_key = ? AND variant = ?', (key, variant)
+            ).fetchone()
+            if row is None or not self._valid(db, row):
+                # Neither the URL nor the video is indexed: the caller downloads
+                self.misses += 1
+                return None
+            if url_key is not None:
+                with db:
+                    db.execute('INSERT OR REPLACE INTO urls VALUES (?, ?)', (url_key, key))
+            return self._hit(db, row)
+
+    def record(self, key, variant, path, title, url_key=None, sha256=None):
+        """Index a finished download; hashes the file unless sha256 is given"""
+        size = os.path.getsize(path)
+        sha256 = sha256 or file_sha256(path)
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            with db:
+                # A file belongs to one entry; an overwritten file invalidates its old one
+                db.execute('DELETE FROM downloads WHERE path = ?', (path,))
+                db.execute(
+                    'INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (key, variant, path, size, sha256, title, now, now)
+                )
+                db.execute('INSERT OR REPLACE INTO urls VALUES (?, ?)', (key, key))
+                if url_key is not None:
+                    db.execute('INSERT OR REPLACE INTO urls VALUES (?, ?)', (url_key, key))
+        return {'video_key': key, 'variant': variant, 'path': path, 'size': size, 'sha256': sha256, 'title': title}
+
+    def reconcile(self, directory, verify=False, adopt=False):
+        """Check the index against the files in directory.
+
+        Entries whose file is missing or has another size (or, with verify, another
+        checksum) are removed. Files not in the index are reported; with adopt,
+        files named like this service's downloads (<YouTube id>[.<height>p].<ext>)
+        are indexed as the audio variant for .mp3, else as the video variant of
+        that height (best quality without one).
+        """
+        with self._lock:
+            rows = [dict(row) for row in self._connect().execute('SELECT * FROM downloads')]
+
+        removed = []
+        for row in rows:
+            try:
+                size = os.path.getsize(row['path'])
+            except OSError:
+                size = None
+            if size != row['size'] or (verify and file_sha256(row['path']) != row['sha256']):
+                removed.append(row)
+
+        tracked = {row['path'] for row in rows} - {row['path'] for row in removed}
+        untracked = sorted(
+            entry.path for entry in os.scandir(directory)
+            if entry.is_file() and not entry.name.startswith('.')
+            and not entry.name.endswith(PARTIAL_SUFFIXES) and entry.path not in tracked
+        ) if os.path.isdir(directory) else []
+
+        adopted = []
+        if adopt:
+            for path in untracked:
+                stem, ext = os.path.splitext(os.path.basename(path))
+                match = re.fullmatch(r'([0-9A-Za-z_-]{11})(?:\.(\d+)p)?', stem)
+                if not match:
+                    continue
+                if ext.lower() == '.mp3':
+                    variant = 'audio:mp3'
+                elif match.group(2):
+                    variant = f'best[height<={match.group(2)}]/best'
+                else:
+                    variant = 'best'
+                entry = self.record(f"youtube:{match.group(1)}", variant, path, None)
+                adopted.append(entry['path'])
+
+        with self._lock:
+            db = self._connect()
+            with db:
+                for row in removed:
+                    db.execute(
+                        'DELETE FROM downloads WHERE video_key = ? AND variant = ? AND path = ?',
+                        (row['video_key'], row['variant'], row['path'])
+                    )
+                db.execute('DELETE FROM urls WHERE video_key NOT IN (SELECT video_key FROM downloads)')
+
+        return {
+            'checked': len(rows),
+            'verified': verify,
+            'removed': [row['path'] for row in removed],
+            'adopted': adopted,
+            'untracked': [path for path in untracked if path not in adopted],
+        }
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._connect().execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM downloads'
+            ).fetchone()
+            return {
+                'path': self.path,
+                'entries': entries,
+                'size_bytes': size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+download_index = DownloadIndex(INDEX_PATH)
+
+
+def download_variant(ydl_opts):
+    """Index variant of a download: the format selector, plus the codec for extracted audio"""
+    if ydl_opts.get('postprocessors'):
+        return f"audio:{ydl_opts['postprocessors'][0]['preferredcodec']}"
+    return ydl_opts['format']
+
+
+def downloaded_path(result, filename):
+    """Final path of a download, after postprocessing"""
+    downloads = result.get('requested_downloads') or []
+    if downloads and downloads[0].get('filepath'):
+        return downloads[0]['filepath']
+    return filename
+
+
+def download_response(entry, downloaded):
+    return {
+        'status': 'success',
+        'filename': os.path.basename(entry['path']),
+        'path': entry['path'],
+        'title': entry['title'],
+        'downloaded': downloaded,
+        'size_bytes': entry['size'],
+        'sha256': entry['sha256'],
+    }
+
+
+def download_from_info(info, ydl_opts):
+    """Download using already extracted metadata instead of extracting the URL again"""
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        # Same path as yt-dlp --load-info-json: a private-key-free copy is processed anew,
+        # so format selection follows ydl_opts and the shared cached dict stays untouched
+        try:
+            result = ydl.process_ie_result(ydl.sanitize_info(info, remove_private_keys=True), download=True)
+        except yt_dlp.utils.DownloadError as e:
+            # Media URLs in the metadata can expire; fall back to a fresh extraction
+            if not info.get('webpage_url'):
+                raise
+            logger.warning(f"Download from cached info failed ({str(e)}); extracting {info['webpage_url']} again")
+            result = ydl.extract_info(info['webpage_url'], download=True)
+        return result, ydl.prepare_filename(result)
+
+
 @app.route('/health', methods=['GET'])
 def health():
     """Service health check"""
-    return jsonify({'status': 'healthy', 'service': 'yt-dlp'}), 200
+    return jsonify({
+        'status': 'healthy',
+        'service': 'yt-dlp',
+        'metadata_cache': metadata_cache.stats(),
+        'download_index': download_index.stats(),
+    }), 200
 
 @app.route('/info', methods=['POST'])
 def get_video_info():
@@ -24,45 +460,28 @@ def get_video_info():
         if not url:
             return jsonify({'error': 'URL is required'}), 400
         
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': False,
-            # Add options to bypass some YouTube restrictions
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['android', 'web']
+        info = metadata_cache.get(url, refresh=bool(data.get('refresh')))
+        
+        # Extract main information
+        video_info = {
+            'title': info.get('title'),
+            'description': info.get('description'),
+            'duration': info.get('duration'),
+            'uploader': info.get('uploader'),
+            'upload_date': info.get('upload_date'),
+            'view_count': info.get('view_count'),
+            'like_count': info.get('like_count'),
+            'thumbnail': info.get('thumbnail'),
+            'formats': [
+                {
+                    'format_id': f.get('format_id'),
+                    'ext': f.get('ext'),
+                    'resolution': f.get('resolution'),
+                    'filesize': f.get('filesize'),
                 }
-            },
-            # Add User-Agent
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            }
+                for f in info.get('formats', [])
+            ]
         }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            
-            # Extract main information
-            video_info = {
-                'title': info.get('title'),
-                'description': info.get('description'),
-                'duration': info.get('duration'),
-                'uploader': info.get('uploader'),
-                'upload_date': info.get('upload_date'),
-                'view_count': info.get('view_count'),
-                'like_count': info.get('like_count'),
-                'thumbnail': info.get('thumbnail'),
-                'formats': [
-                    {
-                        'format_id': f.get('format_id'),
-                        'ext': f.get('ext'),
-                        'resolution': f.get('resolution'),
-                        'filesize': f.get('filesize'),
-                    }
-                    for f in info.get('formats', [])
-                ]
-            }
             
         return jsonify(video_info), 200
         
@@ -80,50 +499,10 @@ def download_video():
 
         if not url:
             return jsonify({'error': 'URL is required'}), 400
+        # The height ends up in the output file name: accept only 'best' or a number
+        if quality != 'best' and not re.fullmatch(r'\d+p?', str(quality)):
+            return jsonify({'error': "quality must be 'best' or a height such as '720p'"}), 400
         
-        # First get video info without downloading
-        info_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': False,
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['android', 'web']
-                }
-            },
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            }
-        }
-        
-        with yt_dlp.YoutubeDL(info_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            video_id = info.get('id')
-            video_title = info.get('title')
-        
-        # Determine expected filename and extension
-        if format_type == 'audio':
-            expected_ext = '.mp3'
-        else:
-            expected_ext = '.webm'  # default extension for video
-
-        expected_filename = f"{video_id}{expected_ext}"
-        expected_path = os.path.join(DOWNLOAD_DIR, expected_filename)
-        
-        # Check if file exists on disk
-        file_exists = os.path.exists(expected_path)
-        
-        if file_exists:
-            # File already exists, return info without downloading
-            return jsonify({
-                'status': 'success',
-                'filename': expected_filename,
-                'path': expected_path,
-                'title': video_title,
-                'downloaded': False,
-            }), 200
-        
-        # File doesn't exist, proceed to download
         ydl_opts = {
             'outtmpl': os.path.join(DOWNLOAD_DIR, '%(id)s.%(ext)s'),
             'quiet': False,
@@ -137,7 +516,7 @@ def download_video():
             },
             # Add User-Agent
             'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+                'User-Agent': USER_AGENT
             },
             # Fail on errors for more stable behavior
             'ignoreerrors': False,
@@ -161,27 +540,39 @@ def download_video():
             ydl_opts['format'] = 'best'
             # Optionally limit height if quality specified
             if quality != 'best':
-                height = quality.replace("p", "")
+                height = int(str(quality).rstrip('p'))
                 ydl_opts['format'] = f'best[height<={height}]/best'
+                # Own file per quality, so it doesn't overwrite the best-quality download
+                ydl_opts['outtmpl'] = os.path.join(DOWNLOAD_DIR, f'%(id)s.{height}p.%(ext)s')
         else:
             ydl_opts['format'] = 'best'
+        variant = download_variant(ydl_opts)
+        url_key = metadata_key(url)
         
-        # Download
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            filename = ydl.prepare_filename(info)
-            
-            # If audio, filename changes after postprocessing
-            if format_type == 'audio':
-                filename = os.path.splitext(filename)[0] + '.mp3'
-            
-        return jsonify({
-            'status': 'success',
-            'filename': os.path.basename(filename),
-            'path': filename,
-            'title': info.get('title'),
-            'downloaded': True,
-        }), 200
+        # Already downloaded from this URL: answered from the index, no network access
+        entry = download_index.lookup_url(url_key, variant)
+        if entry is not None:
+            return jsonify(download_response(entry, False)), 200
+        
+        # Video info from the shared metadata cache; the download below reuses it
+        info = metadata_cache.get(url, refresh=bool(data.get('refresh')))
+        key = video_key(info)
+        
+        # Already downloaded from another URL of the same video
+        entry = download_index.lookup_video(key, variant, url_key)
+        if entry is not None:
+            return jsonify(download_response(entry, False)), 200
+        
+        # Download from the extracted info: no second extractor round-trip
+        result, filename = download_from_info(info, ydl_opts)
+        
+        # If audio, filename changes after postprocessing
+        if format_type == 'audio':
+            filename = os.path.splitext(filename)[0] + '.mp3'
+        filename = downloaded_path(result, filename)
+        
+        entry = download_index.record(key, variant, filename, result.get('title'), url_key)
+        return jsonify(download_response(entry, True)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -197,33 +588,24 @@ def download_transcript():
         if not url:
             return jsonify({'error': 'URL is required'}), 400
         
-        ydl_opts = {
-            'skip_download': True,
-            'writesubtitles': True,
-            'writeautomaticsub': True,
-            'subtitleslangs': [lang],
-            'subtitlesformat': 'json3',
-            'quiet': True,
-        }
+        # Subtitle tracks are part of the extracted metadata, shared with /info and /download
+        info = metadata_cache.get(url, refresh=bool(data.get('refresh')))
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            
-            # Get subtitles
-            subtitles = info.get('subtitles', {})
-            automatic_captions = info.get('automatic_captions', {})
-            
-            available_subs = {}
-            if lang in subtitles:
-                available_subs['manual'] = subtitles[lang]
-            if lang in automatic_captions:
-                available_subs['automatic'] = automatic_captions[lang]
-            
-            if not available_subs:
-                return jsonify({
-                    'error': f'No subtitles available for language: {lang}',
-                    'available_languages': list(subtitles.keys()) + list(automatic_captions.keys())
-                }), 404
+        # Get subtitles
+        subtitles = info.get('subtitles') or {}
+        automatic_captions = info.get('automatic_captions') or {}
+        
+        available_subs = {}
+        if lang in subtitles:
+            available_subs['manual'] = subtitles[lang]
+        if lang in automatic_captions:
+            available_subs['automatic'] = automatic_captions[lang]
+        
+        if not available_subs:
+            return jsonify({
+                'error': f'No subtitles available for language: {lang}',
+                'available_languages': list(subtitles.keys()) + list(automatic_captions.keys())
+            }), 404
             
         return jsonify({
             'status': 'success',
@@ -234,9 +616,28 @@ def download_transcript():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/index/reconcile', methods=['POST'])
+def reconcile_index():
+    """Check the download index against the files on disk"""
+    try:
+        data = request.get_json(silent=True) or {}
+        report = download_index.reconcile(
+            DOWNLOAD_DIR, verify=bool(data.get('verify')), adopt=bool(data.get('adopt'))
+        )
+        return jsonify({'status': 'success', **report}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
     # Create downloads directory if missing
     os.makedirs(DOWNLOAD_DIR, exist_ok=True)
     
+    # Drop entries of deleted files and index downloads made before the index existed
+    report = download_index.reconcile(DOWNLOAD_DIR, adopt=True)
+    logger.info(
+        f"Download index: {report['checked']} entries checked, {len(report['removed'])} removed, "
+        f"{len(report['adopted'])} files adopted, {len(report['untracked'])} untracked"
+    )
+    
     # Start server
     app.run(host='0.0.0.0', port=8081, debug=False)
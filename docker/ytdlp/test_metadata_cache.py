@@ -0,0 +1,107 @@
+"""
+Tests for MetadataCache
+
+The extractor is replaced by a stub and the clock by a counter, so no network
+access or waiting is needed:
+
+    python -m unittest test_metadata_cache
+"""
+import unittest
+from unittest import mock
+
+import app
+
+VIDEO = {'id': 'dQw4w9WgXcQ', 'extractor_key': 'Youtube', 'title': 'Test', 'formats': []}
+
+
+class StubExtractor:
+    def __init__(self, info):
+        self.info = info
+        self.calls = []
+
+    def __call__(self, url):
+        self.calls.append(url)
+        return self.info
+
+
+class MetadataCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        clock = mock.patch.object(app.time, 'monotonic', lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_links_to_one_video_share_an_extraction(self):
+        extractor = StubExtractor(VIDEO)
+        cache = app.MetadataCache(ttl=600, max_entries=100, extractor=extractor)
+
+        cache.get('https://youtu.be/dQw4w9WgXcQ?si=abc')
+        info = cache.get('https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL1')
+
+        self.assertIs(info, VIDEO)
+        self.assertEqual(len(extractor.calls), 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_entries_expire_after_ttl(self):
+        extractor = StubExtractor(VIDEO)
+        cache = app.MetadataCache(ttl=600, max_entries=100, extractor=extractor)
+
+        cache.get('https://youtu.be/dQw4w9WgXcQ')
+        self.now += 599
+        cache.get('https://youtu.be/dQw4w9WgXcQ')
+        self.assertEqual(len(extractor.calls), 1)
+
+        self.now += 2
+        cache.get('https://youtu.be/dQw4w9WgXcQ')
+        self.assertEqual(len(extractor.calls), 2)
+        self.assertEqual(cache.stats()['extractions'], 2)
+
+    def test_refresh_extracts_again(self):
+        extractor = StubExtractor(VIDEO)
+        cache = app.MetadataCache(ttl=600, max_entries=100, extractor=extractor)
+
+        cache.get('https://youtu.be/dQw4w9WgXcQ')
+        cache.get('https://youtu.be/dQw4w9WgXcQ', refresh=True)
+
+        self.assertEqual(len(extractor.calls), 2)
+
+    def test_errors_are_not_cached(self):
+        calls = []
+
+        def failing(url):
+            calls.append(url)
+            raise RuntimeError('unavailable')
+
+        cache = app.MetadataCache(ttl=600, max_entries=100, extractor=failing)
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                cache.get('https://youtu.be/dQw4w9WgXcQ')
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_other_sites_take_one_entry(self):
+        extractor = StubExtractor({'id': '123', 'extractor_key': 'Vimeo', 'title': 'Test'})
+        cache = app.MetadataCache(ttl=600, max_entries=100, extractor=extractor)
+
+        cache.get('https://vimeo.com/123?utm_source=x')
+        cache.get('https://www.vimeo.com/123/')
+
+        self.assertEqual(len(extractor.calls), 1)
+        self.assertEqual(cache.stats()['entries'], 1)
+
+    def test_youtube_alias_serves_canonical_links(self):
+        extractor = StubExtractor(VIDEO)
+        cache = app.MetadataCache(ttl=600, max_entries=100, extractor=extractor)
+
+        # Not recognized as a YouTube link, so it is keyed by URL; the result is also stored by id
+        cache.get('https://www.youtube.com/attribution_link?u=/watch%3Fv%3DdQw4w9WgXcQ')
+        cache.get('https://youtu.be/dQw4w9WgXcQ')
+
+        self.assertEqual(len(extractor.calls), 1)
+        self.assertEqual(cache.stats()['entries'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()